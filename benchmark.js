@@ -0,0 +1,407 @@
+/* This Source Code Form is subject to the terms of the Mozilla Public
+ * License, v. 2.0. If a copy of the MPL was not distributed with this
+ * file, You can obtain one at http://mozilla.org/MPL/2.0/. */
+
+/* Benchmark suite of TeXZilla, to be run with nodejs:
+
+     nodejs [--expose-gc] benchmark.js [--scale N] [--iterations N] [--runs N]
+                                       [--output FILE] [--baseline FILE]
+                                       [--tolerance RATIO] [--min-delta MS]
+                                       [--python PYTHON] [--unicode-xml FILE]
+
+   The formulas of unit-tests.js and synthetic corpora (deep nesting, large
+   matrices and arrays, non-BMP mathematical alphanumerics), scaled by
+   --scale, are converted --iterations times after a warm-up pass. For each
+   corpus, the throughput, the p50/p99 latencies and the peak heap size are
+   measured. This is repeated --runs times (default: 5) and the median of each
+   measure is kept. With --expose-gc, the garbage collector is run before each
+   corpus so that the heap sizes can be compared. The time to load TeXZilla.js
+   in a new process and the time spent by generateCharCommands.py on the
+   --unicode-xml file (if it exists) are measured too.
+
+   The results are written as JSON to --output (default:
+   benchmark-results.json). If --baseline is specified, the results are
+   compared with those of a previous run and the program exits with status 1
+   if one of them is worse by more than --tolerance (default: 0.2, that is
+   20%). Time differences smaller than --min-delta milliseconds per conversion
+   (default: 0.05) are not regressions. The heap sizes are only compared if
+   both runs used --expose-gc. */
+
+var fs = require("fs"), path = require("path"),
+    childProcess = require("child_process"), crypto = require("crypto"),
+    os = require("os");
+
+var TEXZILLA_JS = path.join(__dirname, "TeXZilla.js");
+
+function parseArguments(aArgs) {
+  var options = {
+    scale: 1,
+    iterations: 5,
+    runs: 5,
+    output: "benchmark-results.json",
+    baseline: null,
+    tolerance: 0.2,
+    minDelta: 0.05,
+    python: "python",
+    unicodeXML: path.join(__dirname, "unicode.xml")
+  }, i, name;
+  var names = {
+    "--scale": "scale", "--iterations": "iterations", "--runs": "runs",
+    "--output": "output", "--baseline": "baseline",
+    "--tolerance": "tolerance", "--min-delta": "minDelta",
+    "--python": "python", "--unicode-xml": "unicodeXML"
+  };
+  for (i = 0; i < aArgs.length; i += 2) {
+    name = names[aArgs[i]];
+    if (!name || i + 1 >= aArgs.length) {
+      throw new Error("Invalid argument: " + aArgs[i]);
+    }
+    options[name] = aArgs[i + 1];
+  }
+  options.scale = parseInt(options.scale, 10);
+  options.iterations = parseInt(options.iterations, 10);
+  options.runs = parseInt(options.runs, 10);
+  options.tolerance = parseFloat(options.tolerance);
+  options.minDelta = parseFloat(options.minDelta);
+  return options;
+}
+
+function getTime() {
+  /* Return a timestamp in milliseconds. */
+  var time = process.hrtime();
+  return time[0] * 1e3 + time[1] / 1e6;
+}
+
+function repeat(aString, aCount) {
+  return new Array(aCount + 1).join(aString);
+}
+
+////////////////////////////////////////////////////////////////////////////////
+// Corpora
+////////////////////////////////////////////////////////////////////////////////
+
+function getUnitTestFormulas() {
+  /* Extract the TeX sources of the tests array of unit-tests.js. Running the
+     file would execute the tests, so only the array literal is evaluated. */
+  var source = fs.readFileSync(path.join(__dirname, "unit-tests.js"), "utf8"),
+      start = source.indexOf("var tests = ["),
+      end = source.indexOf("\n]\n", start);
+  if (start < 0 || end < 0) {
+    throw new Error("Cannot find the tests of unit-tests.js");
+  }
+  return (new Function("return " +
+                       source.slice(start + "var tests = ".length, end + 2)))()
+    .map(function(aTest) { return aTest[0]; });
+}
+
+function getNestingFormulas(aScale) {
+  /* Fractions, roots, groups and scripts nested up to 20 * aScale levels. */
+  var formulas = [], depth;
+  for (depth = 1; depth <= 20 * aScale; depth++) {
+    formulas.push(repeat("\\frac{1}{1+", depth) + "x" + repeat("}", depth));
+    formulas.push(repeat("\\sqrt{", depth) + "x" + repeat("}", depth));
+    formulas.push(repeat("{", depth) + "x" + repeat("}", depth));
+    formulas.push(repeat("x_{", depth) + "y" + repeat("}", depth));
+    formulas.push(repeat("\\left(", depth) + "x" + repeat("\\right)", depth));
+  }
+  return formulas;
+}
+
+function getMatrix(aRows, aColumns, aBegin, aEnd) {
+  var rows = [], cells, i, j;
+  for (i = 0; i < aRows; i++) {
+    cells = [];
+    for (j = 0; j < aColumns; j++) {
+      cells.push("a_{" + i + "," + j + "}");
+    }
+    rows.push(cells.join(" & "));
+  }
+  return aBegin + rows.join(" \\\\ ") + aEnd;
+}
+
+function getMatrixFormulas(aScale) {
+  /* Square matrices up to 10 * aScale rows and arrays with long rows. */
+  var formulas = [], size;
+  for (size = 1; size <= 10 * aScale; size++) {
+    formulas.push(getMatrix(size, size,
+                            "\\begin{matrix}", "\\end{matrix}"));
+    formulas.push(getMatrix(size, size,
+                            "\\begin{pmatrix}", "\\end{pmatrix}"));
+    formulas.push(getMatrix(1, 10 * size, "\\begin{array}{" +
+                            repeat("c", 10 * size) + "}", "\\end{array}"));
+    formulas.push(getMatrix(10 * size, 2,
+                            "\\begin{cases}", "\\end{cases}"));
+  }
+  return formulas;
+}
+
+function getNonBMPFormulas(aScale) {
+  /* Mathematical alphanumeric symbols, typed directly or produced by the
+     mathvariant commands. */
+  var formulas = [], letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz",
+      size, codePoint, string;
+  for (size = 1; size <= 10 * aScale; size++) {
+    string = "";
+    for (codePoint = 0x1D400; codePoint < 0x1D400 + 10 * size;
+         codePoint++) {
+      string += String.fromCharCode(0xD800 + ((codePoint - 0x10000) >> 10),
+                                    0xDC00 + ((codePoint - 0x10000) & 0x3FF));
+    }
+    formulas.push(string);
+    string = repeat(letters, Math.ceil(size / 5)).slice(0, 10 * size);
+    formulas.push("\\mathbb{" + string + "}");
+    formulas.push("\\mathfrak{" + string + "}");
+    formulas.push("\\mathscr{" + string + "}");
+  }
+  return formulas;
+}
+
+function getCorpora(aScale) {
+  return {
+    "unit-tests": getUnitTestFormulas(),
+    "nesting": getNestingFormulas(aScale),
+    "matrix": getMatrixFormulas(aScale),
+    "non-bmp": getNonBMPFormulas(aScale)
+  };
+}
+
+////////////////////////////////////////////////////////////////////////////////
+// Measurements
+////////////////////////////////////////////////////////////////////////////////
+
+function getPercentile(aSortedValues, aPercentile) {
+  var index = Math.ceil(aPercentile / 100 * aSortedValues.length) - 1;
+  return aSortedValues[Math.max(0, Math.min(index, aSortedValues.length - 1))];
+}
+
+function getMedian(aValues) {
+  return getPercentile(aValues.slice().sort(function(a, b) { return a - b; }),
+                       50);
+}
+
+function runCorpus(aTeXZilla, aFormulas, aIterations) {
+  /* Convert the formulas once to warm up the JIT, then aIterations times
+     while recording the latency of each conversion. */
+  var latencies = [], total = 0, peakHeap = 0, count = 0, i, j, start,
+      latency, heap;
+  if (global.gc) {
+    /* Do not measure the garbage of the previous corpora. */
+    global.gc();
+  }
+  aFormulas.forEach(function(aTeX) {
+    aTeXZilla.toMathMLString(aTeX);
+  });
+  for (i = 0; i < aIterations; i++) {
+    for (j = 0; j < aFormulas.length; j++) {
+      start = getTime();
+      aTeXZilla.toMathMLString(aFormulas[j]);
+      latency = getTime() - start;
+      latencies.push(latency);
+      total += latency;
+      /* Sampling the heap is not free, so do it outside the measured time
+         and not after each conversion. */
+      if (++count % 16 === 0) {
+        heap = process.memoryUsage().heapUsed;
+        peakHeap = Math.max(peakHeap, heap);
+      }
+    }
+  }
+  peakHeap = Math.max(peakHeap, process.memoryUsage().heapUsed);
+  latencies.sort(function(a, b) { return a - b; });
+  return {
+    "formulas": aFormulas.length,
+    "conversions": latencies.length,
+    "formulasPerSecond": latencies.length / (total / 1e3),
+    "meanMs": total / latencies.length,
+    "p50Ms": getPercentile(latencies, 50),
+    "p99Ms": getPercentile(latencies, 99),
+    "maxMs": latencies[latencies.length - 1],
+    "peakHeapBytes": peakHeap
+  };
+}
+
+function measureStartup(aRuns) {
+  /* Median time to load TeXZilla.js in a new nodejs process. */
+  var script = "var start = process.hrtime(); require(" +
+    JSON.stringify(TEXZILLA_JS) + "); var time = process.hrtime(start);" +
+    "console.log(time[0] * 1e3 + time[1] / 1e6);", times = [], i;
+  for (i = 0; i < aRuns; i++) {
+    times.push(parseFloat(childProcess.
+      execFileSync(process.execPath, ["-e", script]).toString()));
+  }
+  times.sort(function(a, b) { return a - b; });
+  return getPercentile(times, 50);
+}
+
+function measureGeneration(aOptions) {
+  /* Time spent by generateCharCommands.py to generate the lexical rules, or
+     null if unicode.xml is not available. */
+  var directory, start, result;
+  if (!fs.existsSync(aOptions.unicodeXML)) {
+    console.log("Skipping the generator benchmark: " + aOptions.unicodeXML +
+                " not found.");
+    return null;
+  }
+  directory = fs.mkdtempSync(path.join(os.tmpdir(), "texzilla-"));
+  try {
+    start = getTime();
+    result = childProcess.spawnSync(aOptions.python, [
+      path.join(__dirname, "generateCharCommands.py"),
+      "--symbol-index", path.join(directory, "symbol-index.json"),
+      aOptions.unicodeXML, path.join(directory, "char-commands.txt")
+    ], { stdio: "inherit" });
+    if (result.status !== 0) {
+      throw new Error("generateCharCommands.py failed");
+    }
+    return (getTime() - start) / 1e3;
+  } finally {
+    fs.readdirSync(directory).forEach(function(aName) {
+      fs.unlinkSync(path.join(directory, aName));
+    });
+    fs.rmdirSync(directory);
+  }
+}
+
+function runBenchmarks(aOptions) {
+  var TeXZilla, corpora, results, runs, run, name, key, start;
+  results = {
+    "build": crypto.createHash("sha1").
+      update(fs.readFileSync(TEXZILLA_JS)).digest("hex"),
+    "node": process.version,
+    "platform": os.platform() + " " + os.arch(),
+    "date": new Date().toISOString(),
+    "scale": aOptions.scale,
+    "iterations": aOptions.iterations,
+    "runs": aOptions.runs,
+    "gc": Boolean(global.gc)
+  };
+
+  start = getTime();
+  TeXZilla = require(TEXZILLA_JS);
+  results["loadMs"] = getTime() - start;
+  results["startupMs"] = measureStartup(5);
+  results["generationSeconds"] = measureGeneration(aOptions);
+
+  corpora = getCorpora(aOptions.scale);
+  runs = {};
+  for (run = 1; run <= aOptions.runs; run++) {
+    /* The corpora are interleaved so that a temporary slowdown of the
+       machine does not affect all the runs of a single corpus. */
+    for (name in corpora) {
+      console.log("Running the " + name + " corpus (" + corpora[name].length +
+                  " formulas), run " + run + "/" + aOptions.runs + "...");
+      runs[name] = runs[name] || [];
+      runs[name].push(runCorpus(TeXZilla, corpora[name],
+                                aOptions.iterations));
+    }
+  }
+  results["corpora"] = {};
+  for (name in runs) {
+    results["corpora"][name] = {};
+    for (key in runs[name][0]) {
+      results["corpora"][name][key] = getMedian(runs[name].map(function(aRun) {
+        return aRun[key];
+      }));
+    }
+  }
+  if (process.resourceUsage) {
+    results["peakRSSBytes"] = process.resourceUsage().maxRSS * 1024;
+  }
+  return results;
+}
+
+////////////////////////////////////////////////////////////////////////////////
+// Comparison with a baseline
+////////////////////////////////////////////////////////////////////////////////
+
+function getMetrics(aResults, aCompareHeap) {
+  /* Return the comparable metrics as a map from name to value. */
+  var metrics = {}, name, key, corpus;
+  ["startupMs", "generationSeconds", "peakRSSBytes"].forEach(function(aKey) {
+    if (typeof aResults[aKey] === "number") {
+      metrics[aKey] = aResults[aKey];
+    }
+  });
+  for (name in aResults["corpora"]) {
+    corpus = aResults["corpora"][name];
+    ["formulasPerSecond", "p50Ms", "p99Ms"].
+      concat(aCompareHeap ? ["peakHeapBytes"] : []).
+      forEach(function(aKey) {
+        metrics[name + "." + aKey] = corpus[aKey];
+      });
+  }
+  return metrics;
+}
+
+function getDeltaMs(aName, aValue, aBaselineValue) {
+  /* Return the absolute difference of a time metric in milliseconds (per
+     conversion for the throughput), or null for the other metrics. */
+  if (/PerSecond$/.test(aName)) {
+    return Math.abs(1e3 / aValue - 1e3 / aBaselineValue);
+  }
+  if (/Ms$/.test(aName)) {
+    return Math.abs(aValue - aBaselineValue);
+  }
+  return null;
+}
+
+function compareWithBaseline(aResults, aBaseline, aTolerance, aMinDelta) {
+  /* Print the relative change of each metric and return the number of
+     regressions. Only the throughput is better when it is higher. */
+  var compareHeap = Boolean(aResults["gc"] && aBaseline["gc"]),
+      metrics = getMetrics(aResults, compareHeap),
+      baseline = getMetrics(aBaseline, compareHeap),
+      regressions = 0, name, change, delta, higherIsBetter, regression;
+  if (aBaseline["build"] === aResults["build"]) {
+    console.log("Note: the baseline was measured with the same build.");
+  }
+  for (name in metrics) {
+    if (!(name in baseline) || !baseline[name]) {
+      continue;
+    }
+    change = metrics[name] / baseline[name] - 1;
+    higherIsBetter = /PerSecond$/.test(name);
+    regression = higherIsBetter ? change < -aTolerance : change > aTolerance;
+    delta = getDeltaMs(name, metrics[name], baseline[name]);
+    if (delta !== null && delta < aMinDelta) {
+      /* Too small to be measured reliably. */
+      regression = false;
+    }
+    if (regression) {
+      regressions++;
+    }
+    console.log((regression ? "REGRESSION " : "           ") + name + ": " +
+                baseline[name].toPrecision(4) + " -> " +
+                metrics[name].toPrecision(4) + " (" +
+                (change >= 0 ? "+" : "") + (change * 100).toFixed(1) + "%)");
+  }
+  return regressions;
+}
+
+function main(aArgs) {
+  var options = parseArguments(aArgs), results, regressions;
+  results = runBenchmarks(options);
+  fs.writeFileSync(options.output, JSON.stringify(results, null, 2) + "\n");
+  console.log("Results written to " + options.output);
+  if (options.baseline) {
+    regressions = compareWithBaseline(results,
+                                      JSON.parse(fs.readFileSync(
+                                        options.baseline, "utf8")),
+                                      options.tolerance, options.minDelta);
+    if (regressions > 0) {
+      console.log(regressions + " metric(s) regressed by more than " +
+                  (options.tolerance * 100) + "% compared to " +
+                  options.baseline + ".");
+      process.exit(1);
+    }
+    console.log("No regression compared to " + options.baseline + ".");
+  }
+}
+
+exports.getCorpora = getCorpora;
+exports.getPercentile = getPercentile;
+exports.getTime = getTime;
+
+if (require.main === module) {
+  main(process.argv.slice(2));
+}
@@ -0,0 +1,134 @@
+/* -*- Mode: Javascript; indent-tabs-mode:nil; js-indent-level: 2 -*- */
+/* vim: set ts=2 et sw=2 tw=80: */
+/*jslint indent: 2 */
+/* This Source Code Form is subject to the terms of the Mozilla Public
+ * License, v. 2.0. If a copy of the MPL was not distributed with this
+ * file, You can obtain one at http://mozilla.org/MPL/2.0/. */
+
+////////////////////////////////////////////////////////////////////////////////
+// Load TeXZilla.js in nodejs with a V8 code cache.
+//
+// Compiling the generated parser takes a significant part of the time of a
+// short-lived process. This loader saves the code compiled by V8 in a cache
+// file, indexed by the hash of TeXZilla.js and the version of nodejs, and
+// reuses it in the next processes. Use it as TeXZilla.js on the command line
+//
+//   nodejs codeCache.js parser "a^2+b^2=c^2"
+//
+// or from a nodejs program:
+//
+//   var TeXZilla = require("./codeCache").load();
+//
+// The cache directory is $TEXZILLA_CACHE_DIR, or texzilla/ in
+// $XDG_CACHE_HOME or ~/.cache. If it can not be written, TeXZilla.js is just
+// compiled as usual.
+////////////////////////////////////////////////////////////////////////////////
+
+var fs = require("fs"), path = require("path"), vm = require("vm"),
+    crypto = require("crypto"), os = require("os");
+
+var TEXZILLA_JS = path.join(__dirname, "TeXZilla.js");
+
+// Delay after which the cache is written, in milliseconds, for long-lived
+// processes such as the webserver command.
+var CACHE_WRITE_DELAY = 10000;
+
+var getCacheDirectory = function () {
+  if (process.env.TEXZILLA_CACHE_DIR) {
+    return process.env.TEXZILLA_CACHE_DIR;
+  }
+  return path.join(process.env.XDG_CACHE_HOME ||
+                   path.join(os.homedir(), ".cache"), "texzilla");
+};
+
+var getCachePath = function (aSource) {
+  // The code cache is only valid for the same source and V8 version.
+  var hash = crypto.createHash("sha1");
+  hash.update(aSource);
+  hash.update(process.version + " " + process.versions.v8 + " " + process.arch);
+  return path.join(getCacheDirectory(), hash.digest("hex") + ".bin");
+};
+
+var readCache = function (aCachePath) {
+  try {
+    return fs.readFileSync(aCachePath);
+  } catch (e) {
+    return undefined;
+  }
+};
+
+var writeCache = function (aCachePath, aScript) {
+  // Write the cache atomically, so that concurrent processes never read a
+  // truncated file.
+  var temporaryPath = aCachePath + "." + process.pid + ".tmp";
+  try {
+    fs.mkdirSync(path.dirname(aCachePath), { recursive: true });
+    fs.writeFileSync(temporaryPath, aScript.createCachedData());
+    fs.renameSync(temporaryPath, aCachePath);
+  } catch (e) {
+    try {
+      fs.unlinkSync(temporaryPath);
+    } catch (e2) {
+    }
+  }
+};
+
+var saveCacheLater = function (aCachePath, aScript) {
+  // Save the cache once, when the process exits or after a warm-up delay,
+  // so that it also contains the functions compiled lazily during the
+  // conversions.
+  var saved = false, timer, save = function () {
+    if (!saved) {
+      saved = true;
+      clearTimeout(timer);
+      writeCache(aCachePath, aScript);
+    }
+  };
+  process.on("exit", save);
+  timer = setTimeout(save, CACHE_WRITE_DELAY);
+  timer.unref();
+};
+
+var load = function (aPath, aIsMain) {
+  // Compile and run aPath as a commonJS module and return its exports. If
+  // aIsMain is true, the module is run as the main program.
+  var source, cachePath, cachedData, script, module, moduleRequire;
+  aPath = path.resolve(aPath || TEXZILLA_JS);
+  source = fs.readFileSync(aPath, "utf8");
+  cachePath = getCachePath(source);
+  cachedData = readCache(cachePath);
+  script = new vm.Script("(function (exports, require, module, __filename, " +
+                         "__dirname) {" + source + "\n})",
+                         { filename: aPath, cachedData: cachedData });
+  if (cachedData === undefined || script.cachedDataRejected) {
+    saveCacheLater(cachePath, script);
+  }
+
+  module = { exports: {}, filename: aPath, id: aPath, loaded: false };
+  moduleRequire = function (aId) {
+    return require(aId);
+  };
+  moduleRequire.main = aIsMain ? module : require.main;
+  script.runInThisContext().call(module.exports, module.exports,
+                                 moduleRequire, module, aPath,
+                                 path.dirname(aPath));
+  module.loaded = true;
+  return module.exports;
+};
+
+exports.load = load;
+
+if (require.main === module) {
+  // Run the command line API of TeXZilla.js. Node does not emit "exit" when
+  // it is killed by a signal, so SIGINT and SIGTERM exit explicitly to save
+  // the cache, unless the command handles them. Programs that use load() are
+  // left in charge of their signals.
+  load(TEXZILLA_JS, true);
+  [["SIGINT", 130], ["SIGTERM", 143]].forEach(function (aSignal) {
+    if (process.listenerCount(aSignal[0]) === 0) {
+      process.once(aSignal[0], function () {
+        process.exit(aSignal[1]);
+      });
+    }
+  });
+}
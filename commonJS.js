@@ -21,12 +21,30 @@ if (typeof require !== "undefined" && typeof exports !== "undefined") {
   exports.setItexIdentifierMode = function (aEnable) {
     TeXZilla.setItexIdentifierMode(aEnable);
   };
+  exports.setProfiling = function (aEnable) {
+    TeXZilla.setProfiling(aEnable);
+  };
+  exports.getStatistics = function () {
+    return TeXZilla.getStatistics();
+  };
+  exports.resetStatistics = function () {
+    TeXZilla.resetStatistics();
+  };
+  exports.setLimits = function (aLimits) {
+    TeXZilla.setLimits(aLimits);
+  };
+  exports.getLimits = function () {
+    return TeXZilla.getLimits();
+  };
   exports.getTeXSource = function () {
     return TeXZilla.getTeXSource.apply(TeXZilla, arguments);
   };
   exports.toMathMLString = function () {
     return TeXZilla.toMathMLString.apply(TeXZilla, arguments);
   };
+  exports.writeMathML = function () {
+    return TeXZilla.writeMathML.apply(TeXZilla, arguments);
+  };
   exports.toMathML = function () {
     return TeXZilla.toMathML.apply(TeXZilla, arguments);
   };
@@ -39,6 +57,12 @@ if (typeof require !== "undefined" && typeof exports !== "undefined") {
   exports.filterElement = function () {
     return TeXZilla.filterElement.apply(TeXZilla, arguments);
   };
+  exports.createStreamFilter = function () {
+    return TeXZilla.createStreamFilter.apply(TeXZilla, arguments);
+  };
+  exports.createIncrementalFilter = function () {
+    return TeXZilla.createIncrementalFilter.apply(TeXZilla, arguments);
+  };
 }
 
 ////////////////////////////////////////////////////////////////////////////////
@@ -68,8 +92,11 @@ if (typeof require !== "undefined") {
     console.log("commonjs TeXZilla.js parser aTeX [aDisplay] [aRTL] [aThrowExceptionOnError]");
     console.log("  Print TeXZilla.toMathMLString(aTeX, aDisplay, aRTL, aThrowExceptionOnError)");
     console.log("  The interpretation of arguments and the default values are the same.\n");
-    console.log("commonjs TeXZilla.js webserver [port] [safe] [itexId]");
+    console.log("commonjs TeXZilla.js webserver [port] [safe] [itexId] [profile] [limits]");
     console.log("  Start a Web server on the specified port (default:3141)");
+    console.log("  If profile is true, the conversion statistics are available");
+    console.log("  at the /metrics URL. limits is a JSON object passed to");
+    console.log("  TeXZilla.setLimits e.g. '{\"maxLength\":10000,\"timeout\":500}'.");
     console.log("  See the TeXZilla wiki for details.\n");
     console.log("cat input | commonjs TeXZilla.js streamfilter [safe] [itexId] > output");
     console.log("  Make TeXZilla behaves as a stream filter. The TeX fragments are");
@@ -83,16 +110,19 @@ if (typeof require !== "undefined") {
     if (aKey === "tex") {
       aParam[aKey] = aString;
     } else if (aKey === "display" || aKey === "rtl" || aKey === "exception" ||
-               aKey === "safe" || aKey === "itexId") {
+               aKey === "safe" || aKey === "itexId" || aKey === "profile") {
       aParam[aKey] = (aString === "true");
     }
   };
 
   var getMathMLString = function (aParam) {
     // Call the TeXZilla parser with the specified parameters and
-    // return the MathML output.
+    // return the MathML output. The safe and itexId parameters override the
+    // modes of the parser for this call only.
     return TeXZilla.toMathMLString(aParam.tex, aParam.display,
-                                   aParam.rtl, aParam.exception);
+                                   aParam.rtl, aParam.exception,
+                                   { safe: aParam.safe,
+                                     itexId: aParam.itexId });
   };
 
   var getParametersFromURL = function (aURL) {
@@ -112,17 +142,27 @@ if (typeof require !== "undefined") {
     return param;
   };
 
-  var getParametersFromPOSTData = function (aPOSTData) {
-    // Get the param values from the POST JSON data.
-    var param = {}, json = JSON.parse(aPOSTData), key;
-    for (key in json) {
-      setParamValue(param, key, json[key]);
+  var getParametersFromObject = function (aObject) {
+    // Get the param values from a JSON object.
+    var param = {}, key;
+    for (key in aObject) {
+      setParamValue(param, key, aObject[key]);
     }
     return param;
   };
 
-  var getServerResponseFromParam = function (aParam) {
-    // Get the JSON data to send back.
+  var getParametersFromPOSTData = function (aPOSTData) {
+    // Get the param values from the POST JSON data. For a batch request, the
+    // data is an array of objects and an array of param values is returned.
+    var json = JSON.parse(aPOSTData);
+    if (Array.isArray(json)) {
+      return json.map(getParametersFromObject);
+    }
+    return getParametersFromObject(json);
+  };
+
+  var getServerResponseData = function (aParam) {
+    // Get the result of the conversion.
     var data = { tex: aParam.tex };
     try {
       data.mathml = getMathMLString(aParam);
@@ -130,18 +170,58 @@ if (typeof require !== "undefined") {
     } catch (e) {
       data.exception = e.message;
     }
-    return JSON.stringify(data);
+    return data;
+  };
+
+  var getServerResponseFromParam = function (aParam) {
+    // Get the JSON data to send back.
+    return JSON.stringify(getServerResponseData(aParam));
+  };
+
+  var getServerResponseFromBatch = function (aParams) {
+    // Get the JSON data to send back for an array of param values, in the
+    // same order. Identical formulas are only converted once and the items
+    // without TeX source get an error.
+    var results = [], converted = {}, i, param, key;
+    for (i = 0; i < aParams.length; i++) {
+      param = aParams[i];
+      if (param.tex === undefined) {
+        results.push({ exception: "Missing tex parameter" });
+        continue;
+      }
+      key = JSON.stringify([param.tex, !!param.display, !!param.rtl,
+                            !!param.exception, param.safe, param.itexId]);
+      if (!converted.hasOwnProperty(key)) {
+        converted[key] = getServerResponseData(param);
+      }
+      results.push(converted[key]);
+    }
+    return JSON.stringify(results);
+  };
+
+  var isMetricsURL = function (aURL) {
+    return aURL.split("?")[0] === "/metrics";
+  };
+
+  var getMetricsResponse = function () {
+    // Get the JSON data to send back for the /metrics URL, that is the
+    // conversion statistics or null if profiling is disabled.
+    return JSON.stringify(TeXZilla.getStatistics());
   };
 
   var webserverListener = function (aRequest, aResponse) {
     // Listener for the "webserver" module (phantomjs, slimerjs).
     var param = {}, json = {}, response;
-    if (aRequest.method === "GET") {
+    if (aRequest.method === "GET" && isMetricsURL(aRequest.url)) {
+      json = getMetricsResponse();
+    } else if (aRequest.method === "GET") {
       param = getParametersFromURL(aRequest.url);
     } else if (aRequest.method === "POST") {
       param = getParametersFromPOSTData(aRequest.post);
     }
-    if (param.tex !== undefined) {
+    if (Array.isArray(param)) {
+      json = getServerResponseFromBatch(param);
+    } else if (param.tex !== undefined) {
       json = getServerResponseFromParam(param);
     }
     response = JSON.stringify(json);
@@ -159,13 +239,16 @@ if (typeof require !== "undefined") {
       body += aChunk;
     });
     aRequest.on("end", function () {
-      aResponse.writeHead(200, {"Content-Type": ""});
-      if (aRequest.method === "GET") {
+      if (aRequest.method === "GET" && isMetricsURL(aRequest.url)) {
+        json = getMetricsResponse();
+      } else if (aRequest.method === "GET") {
         param = getParametersFromURL(aRequest.url);
       } else if (aRequest.method === "POST") {
         param = getParametersFromPOSTData(body);
       }
-      if (param.tex !== undefined) {
+      if (Array.isArray(param)) {
+        json = getServerResponseFromBatch(param);
+      } else if (param.tex !== undefined) {
         json = getServerResponseFromParam(param);
       }
       response = JSON.stringify(json);
@@ -202,12 +285,17 @@ if (typeof require !== "undefined") {
         exitCommonJS(1);
       }
     } else if (aArgs.length >= 2 && aArgs[1] === "webserver") {
-      setParamValue(param, "safe", aArgs[2]);
+      setParamValue(param, "safe", aArgs[3]);
       TeXZilla.setSafeMode(param.safe);
-      setParamValue(param, "itexId", aArgs[3]);
+      setParamValue(param, "itexId", aArgs[4]);
       TeXZilla.setItexIdentifierMode(param.itexId);
+      setParamValue(param, "profile", aArgs[5]);
+      TeXZilla.setProfiling(param.profile);
       // Run a Web server.
       try {
+        if (aArgs.length >= 7) {
+          TeXZilla.setLimits(JSON.parse(aArgs[6]));
+        }
         startWebServer(aArgs.length >= 3 ? parseInt(aArgs[2], 10) : 3141);
       } catch (e) {
         console.log(e);
@@ -219,12 +307,15 @@ if (typeof require !== "undefined") {
       setParamValue(param, "itexId", aArgs[3]);
       TeXZilla.setItexIdentifierMode(param.itexId);
       if (typeof process !== "undefined") {
-        var stdinContent = "";
+        // Convert the math segments as soon as they are read.
+        var streamFilter = TeXZilla.createStreamFilter(true);
         process.stdin.resume();
         process.stdin.setEncoding("utf-8");
-        process.stdin.on("data", function(aData) { stdinContent += aData; });
+        process.stdin.on("data", function(aData) {
+          process.stdout.write(streamFilter.write(aData));
+        });
         process.stdin.on("end", function() {
-          console.log(TeXZilla.filterString(stdinContent, true));
+          console.log(streamFilter.end());
           exitCommonJS(0);
         });
       } else {
@@ -10,39 +10,59 @@
 #
 #   python TeXZillaParser.py aTeX [aDisplay] [aRTL] [aThrowExceptionOnError]
 #
+# To convert a file with one formula per line over all the CPU cores, use
+#
+#   python TeXZillaParser.py --batch [--display] [--rtl] [--throw]
+#                            [--processes N] [aFile]
+#
+# which prints one JSON object {tex, mathml, exception} per line, in the input
+# order. Add --cache aFile to reuse the results of previous runs.
+#
+# To convert a corpus of newline-delimited JSON records, each distinct formula
+# being converted only once, use
+#
+#   python TeXZillaParser.py --bulk [--field tex] [--display] [--rtl]
+#                            [--throw] [--processes N] input.ndjson output
+#
+# If the conversion is interrupted, run the same command again to resume it.
+#
+# To convert the math segments of a large document with bounded memory, use
+#
+#   cat input | python TeXZillaParser.py --streamfilter > output
+#
+# The conversions are done by the texzilla package of this directory, which
+# you can also use in your Python programs, see texzilla/__init__.py.
+#
 
 from __future__ import print_function
 import sys
-import spidermonkey
+from texzilla import TeXZillaEngine
+from texzilla.cli import COMMANDS
 
 class TeXZillaParser:
 
-    TEXZILLA_JS = "../TeXZilla-min.js"
-
     def main(self, aArgs):
         # Verify parameters.
         if len(aArgs) == 0:
             print("usage: python TeXZillaParser.py aTeX [aDisplay] [aRTL] [aThrowExceptionOnError]")
+            print("       python TeXZillaParser.py --batch [--display] [--rtl] [--throw] [--processes N] [aFile]")
+            print("       python TeXZillaParser.py --bulk [--field tex] [--display] [--rtl] [--throw] [--processes N] input output")
+            print("       python TeXZillaParser.py --streamfilter [safe] [itexId] < input > output")
             sys.exit(1)
+        if aArgs[0] in COMMANDS:
+            COMMANDS[aArgs[0]](aArgs[1:])
+            return
         tex = aArgs[0]
         display = len(aArgs) >= 2 and aArgs[1] == "true"
         rtl = len(aArgs) >= 3 and aArgs[2] == "true"
         throwException = len(aArgs) >= 4 and aArgs[3] == "true"
 
-        # Prepare the SpiderMonkey Javascript engine.
-        rt = spidermonkey.Runtime()
-        cx = rt.new_context()
-
         # Load TeXZilla.js and execute TeXZilla.toMathMLString with the
         # specified arguments.
-        cx.execute("var window = {}")
-        f = open(self.TEXZILLA_JS, "r")
-        cx.execute(f.read())
-        f.close()
-        TeXZilla = cx.execute("window.TeXZilla")
+        engine = TeXZillaEngine()
         try:
-            print(TeXZilla.toMathMLString(tex, display, rtl, throwException))
-        except Exception, e:
+            print(engine.to_mathml_string(tex, display, rtl, throwException))
+        except Exception as e:
             print(str(e))
             sys.exit(1)
 
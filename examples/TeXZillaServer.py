@@ -0,0 +1,473 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+# Follow the instructions of TeXZillaParser.py to install the SpiderMonkey
+# module and execute this program with Python 3:
+#
+#   python3 TeXZillaServer.py [--port 3141] [--safe] [--itexId]
+#                             [--workers N] [--concurrency N] [--queue-size N]
+#                             [--backlog N] [--timeout SECONDS] [--profile]
+#                             [--max-length N] [--max-depth N]
+#                             [--max-tokens N] [--max-output-size N]
+#                             [--budget SECONDS]
+#
+# This starts a Web server speaking the same protocol as the webserver command
+# of TeXZilla.js: the parameters tex, display, rtl and exception are read from
+# the GET query or from a POST JSON object and the response is the JSON
+# object {tex, mathml, exception}, itself encoded as a JSON string. A POST
+# JSON array of parameter objects is converted as a batch and the response is
+# the array of results, in the same order. Identical formulas in a batch are
+# only converted once and an item without a tex parameter gets the result
+# {exception} with an error message. The safe and itexId parameters override the --safe and
+# --itexId options for one conversion.
+#
+# The conversions are done by a pool of worker processes, each of them with
+# its own TeXZillaEngine loaded at startup. On POSIX systems, the workers are
+# forked from a process where TeXZilla is already loaded, so that starting
+# them is fast. A worker that exceeds the timeout is killed and replaced, so
+# that a pathological formula does not stall the other clients. At most
+# --concurrency requests are converted at the same time and at most
+# --queue-size other requests wait for a worker. Additional requests are
+# rejected with the 503 status. Each distinct formula of a batch counts as one
+# request and a batch is only accepted if they all fit. The --backlog option is
+# the number of TCP connections that the system keeps waiting to be accepted.
+#
+# The --max-* options and the --budget of each conversion are passed to
+# TeXZillaEngine.set_limits. A formula that exceeds them gets the usual
+# <merror> output quickly, without replacing the worker. Use a budget smaller
+# than the timeout.
+#
+# With --profile, the workers enable TeXZilla.setProfiling and the merged
+# statistics are returned for GET /metrics. The statistics of a worker are
+# lost when it is replaced.
+#
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import urllib.parse
+
+from texzilla import createEngine, mergeStatistics, TEXZILLA_JS
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 413: "Payload Too Large",
+                503: "Service Unavailable", 504: "Gateway Timeout"}
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+# The data of a response without any result, sent as {}.
+NO_DATA = object()
+
+# The error of a batch item without a tex parameter.
+MISSING_TEX = "Missing tex parameter"
+
+# The workers are restarted from the threads waiting for them, so do not fork
+# the server process. If possible, they are forked from a forkserver process
+# that has loaded TeXZilla once, see main.
+if "forkserver" in multiprocessing.get_all_start_methods():
+    WORKER_CONTEXT = multiprocessing.get_context("forkserver")
+else:
+    WORKER_CONTEXT = multiprocessing.get_context("spawn")
+
+def stringifyJSON(aValue):
+    # Same output as JSON.stringify.
+    return json.dumps(aValue, ensure_ascii = False, separators = (",", ":"))
+
+def setParamValue(aParam, aKey, aString):
+    # Set the param value from the string value, as in commonJS.js.
+    if aKey == "tex":
+        aParam[aKey] = aString
+    elif aKey in ["display", "rtl", "exception", "safe", "itexId"]:
+        aParam[aKey] = (aString == "true")
+
+def getParametersFromURL(aURL):
+    # Get the param values from the GET URL.
+    param = {}
+    query = aURL.split("?")
+    if len(query) > 1 and query[1]:
+        for var in query[1].split("&"):
+            pair = var.split("=")
+            key = urllib.parse.unquote(pair[0]).lower()
+            if len(pair) > 1:
+                setParamValue(param, key, urllib.parse.unquote(pair[1]))
+            else:
+                # Same as decodeURIComponent(undefined) in JavaScript.
+                setParamValue(param, key, "undefined")
+    return param
+
+def getParametersFromObject(aObject):
+    # Get the param values from a JSON object. Raise ValueError if the TeX
+    # source is not a string.
+    param = {}
+    if isinstance(aObject, dict):
+        for key in aObject:
+            if key == "tex" and not isinstance(aObject[key], str):
+                raise ValueError("tex must be a string")
+            setParamValue(param, key, aObject[key])
+    return param
+
+def getParametersFromPOSTData(aPOSTData):
+    # Get the param values from the POST JSON data. For a batch request, the
+    # data is an array of objects and a list of param values is returned.
+    data = json.loads(aPOSTData)
+    if isinstance(data, list):
+        return [getParametersFromObject(item) for item in data]
+    return getParametersFromObject(data)
+
+def getBatchKey(aParam):
+    # Key identifying the conversions giving the same result.
+    return (aParam["tex"], aParam.get("display", False),
+            aParam.get("rtl", False), aParam.get("exception", False),
+            aParam.get("safe"), aParam.get("itexId"))
+
+def runWorker(aConnection, aTeXZillaJS, aSafeMode, aItexIdentifierMode,
+              aProfile, aLimits):
+    # Main loop of a worker process: load TeXZilla once and convert the
+    # parameters received until None is received. "statistics" is answered
+    # with the profiling statistics.
+    engine = createEngine(aTeXZillaJS)
+    engine.set_safe_mode(aSafeMode)
+    engine.set_itex_identifier_mode(aItexIdentifierMode)
+    engine.set_profiling(aProfile)
+    engine.set_limits(**(aLimits or {}))
+    aConnection.send(True)
+    while True:
+        param = aConnection.recv()
+        if param is None:
+            break
+        if param == "statistics":
+            aConnection.send(engine.get_statistics())
+            continue
+        data = {"tex": param["tex"]}
+        try:
+            data["mathml"] = engine.to_mathml_string(
+                param["tex"], param.get("display", False),
+                param.get("rtl", False), param.get("exception", False),
+                param.get("safe"), param.get("itexId"))
+            data["exception"] = None
+        except Exception as e:
+            data["exception"] = str(e)
+        aConnection.send(data)
+    aConnection.close()
+
+class TeXZillaWorker:
+
+    def __init__(self, aTeXZillaJS, aSafeMode, aItexIdentifierMode,
+                 aProfile = False, aLimits = None):
+        self.arguments = (aTeXZillaJS, aSafeMode, aItexIdentifierMode,
+                          aProfile, aLimits)
+        # Serialize the exchanges with the process. A worker only converts
+        # one request at a time, but the statistics can be requested at any
+        # time.
+        self.lock = threading.Lock()
+        self.start()
+
+    def start(self):
+        # Start the worker process and wait until its engine is loaded.
+        self.connection, child = WORKER_CONTEXT.Pipe()
+        self.process = WORKER_CONTEXT.Process(target = runWorker,
+                                              args = (child,) + self.arguments)
+        self.process.daemon = True
+        self.process.start()
+        child.close()
+        self.connection.recv()
+
+    def stop(self):
+        self.process.terminate()
+        self.process.join()
+        self.connection.close()
+
+    def convert(self, aParam, aTimeout):
+        # Send the parameters to the worker process and wait for the result.
+        # If it takes more than aTimeout seconds, the process is replaced.
+        # This is blocking, so it is called from a thread.
+        with self.lock:
+            self.connection.send(aParam)
+            if not self.connection.poll(aTimeout):
+                self.stop()
+                self.start()
+                raise TimeoutError("Conversion timed out")
+            return self.connection.recv()
+
+    def getStatistics(self):
+        # Return the profiling statistics of the worker process. This waits
+        # for the conversion in progress, if any.
+        with self.lock:
+            self.connection.send("statistics")
+            return self.connection.recv()
+
+    def close(self):
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.connection.close()
+
+class TeXZillaWorkerPool:
+
+    def __init__(self, aWorkers, aConcurrency, aQueueSize, aTimeout,
+                 aTeXZillaJS = TEXZILLA_JS, aSafeMode = False,
+                 aItexIdentifierMode = False, aProfile = False,
+                 aLimits = None):
+        self.workers = [TeXZillaWorker(aTeXZillaJS, aSafeMode,
+                                       aItexIdentifierMode, aProfile, aLimits)
+                        for i in range(aWorkers)]
+        self.idleWorkers = asyncio.Queue()
+        for worker in self.workers:
+            self.idleWorkers.put_nowait(worker)
+        self.executor = concurrent.futures.ThreadPoolExecutor(aWorkers)
+        self.semaphore = asyncio.Semaphore(aConcurrency)
+        self.maxPending = aConcurrency + aQueueSize
+        self.pending = 0
+        self.timeout = aTimeout
+
+    def reserve(self, aCount):
+        # Reserve aCount pending conversions. Return False and reserve nothing
+        # if they do not all fit in the queue. The caller must convert the
+        # parameters and then call release.
+        if self.pending + aCount > self.maxPending:
+            return False
+        self.pending += aCount
+        return True
+
+    def release(self, aCount):
+        self.pending -= aCount
+
+    async def convert(self, aParam):
+        # Convert the parameters with the first idle worker. Raise
+        # asyncio.TimeoutError if the result is not available within the
+        # timeout, including the time spent waiting for a worker.
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + self.timeout
+        await asyncio.wait_for(self.semaphore.acquire(), self.timeout)
+        try:
+            worker = await asyncio.wait_for(self.idleWorkers.get(),
+                                            deadline - loop.time())
+            try:
+                if deadline <= loop.time():
+                    raise asyncio.TimeoutError()
+                return await loop.run_in_executor(self.executor,
+                                                  worker.convert, aParam,
+                                                  deadline - loop.time())
+            except TimeoutError:
+                raise asyncio.TimeoutError()
+            finally:
+                self.idleWorkers.put_nowait(worker)
+        finally:
+            self.semaphore.release()
+
+    async def getStatistics(self):
+        # Return the merged statistics of the workers, or None if profiling
+        # is disabled.
+        loop = asyncio.get_event_loop()
+        statistics = await asyncio.wait_for(asyncio.gather(
+            *[loop.run_in_executor(None, worker.getStatistics)
+              for worker in self.workers]), self.timeout)
+        return mergeStatistics(statistics)
+
+    def close(self):
+        self.executor.shutdown()
+        for worker in self.workers:
+            worker.close()
+
+class TeXZillaServer:
+
+    def __init__(self, aPool):
+        self.pool = aPool
+
+    async def getResponse(self, aMethod, aURL, aBody):
+        # Return the status and JSON data to send back.
+        if aMethod == "GET" and aURL.split("?")[0] == "/metrics":
+            return await self.getMetricsResponse()
+        try:
+            if aMethod == "POST":
+                param = getParametersFromPOSTData(aBody.decode("utf-8"))
+            else:
+                param = getParametersFromURL(aURL)
+        except ValueError as e:
+            return (400, {"exception": str(e)})
+        if isinstance(param, list):
+            return await self.getBatchResponse(param)
+        if "tex" not in param:
+            return (200, NO_DATA)
+        if not self.pool.reserve(1):
+            return (503, {"tex": param["tex"], "exception": "Server busy"})
+        try:
+            return (200, await self.pool.convert(param))
+        except asyncio.TimeoutError:
+            return (504, {"tex": param["tex"],
+                          "exception": "Conversion timed out"})
+        finally:
+            self.pool.release(1)
+
+    async def getMetricsResponse(self):
+        try:
+            return (200, await self.pool.getStatistics())
+        except asyncio.TimeoutError:
+            return (504, {"exception": "Statistics timed out"})
+
+    async def getBatchResponse(self, aParams):
+        # Return the status and JSON data to send back for a list of param
+        # values, in the same order. Identical formulas are only converted
+        # once and the other ones are dispatched to the workers in parallel.
+        # The whole batch is rejected if its distinct formulas do not all fit
+        # in the queue.
+        converted = collections.OrderedDict()
+        for param in aParams:
+            if "tex" in param:
+                converted[getBatchKey(param)] = param
+        if len(converted) > self.pool.maxPending:
+            return (413, {"exception": "Batch too large"})
+        if not self.pool.reserve(len(converted)):
+            return (503, {"exception": "Server busy"})
+
+        async def convert(aParam):
+            try:
+                return await self.pool.convert(aParam)
+            except asyncio.TimeoutError:
+                return {"tex": aParam["tex"],
+                        "exception": "Conversion timed out"}
+
+        try:
+            results = await asyncio.gather(*[convert(param) for param
+                                             in converted.values()])
+        finally:
+            self.pool.release(len(converted))
+        converted = dict(zip(converted.keys(), results))
+        return (200, [converted[getBatchKey(param)] if "tex" in param else
+                      {"exception": MISSING_TEX}
+                      for param in aParams])
+
+    async def handleConnection(self, aReader, aWriter):
+        # Read the HTTP requests of a connection and send the responses.
+        try:
+            while True:
+                requestLine = await aReader.readline()
+                if not requestLine:
+                    break
+                parts = requestLine.decode("latin-1").split()
+                if len(parts) < 2:
+                    break
+                method, url = parts[0], parts[1]
+                version = parts[2] if len(parts) > 2 else "HTTP/1.0"
+                headers = {}
+                while True:
+                    line = await aReader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keepAlive = (headers.get("connection", "").lower() !=
+                             "close" if version == "HTTP/1.1" else
+                             headers.get("connection", "").lower() ==
+                             "keep-alive")
+                length = int(headers.get("content-length", "0"))
+                if length > MAX_BODY_SIZE:
+                    await self.sendResponse(aWriter, 413, NO_DATA, False)
+                    break
+                body = await aReader.readexactly(length) if length > 0 else b""
+                status, data = await self.getResponse(method, url, body)
+                await self.sendResponse(aWriter, status, data, keepAlive)
+                if not keepAlive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            aWriter.close()
+
+    async def sendResponse(self, aWriter, aStatus, aData, aKeepAlive):
+        # Send the response as the TeXZilla.js webserver does, that is with
+        # the JSON data stringified a second time.
+        if aData is NO_DATA:
+            aData = {}
+        else:
+            aData = stringifyJSON(aData)
+        body = stringifyJSON(aData).encode("utf-8")
+        head = ["HTTP/1.1 %d %s" % (aStatus, HTTP_REASONS[aStatus]),
+                "Content-Type: application/json",
+                "Content-Length: %d" % len(body),
+                "Connection: %s" % ("keep-alive" if aKeepAlive else "close")]
+        if aStatus == 503:
+            head.append("Retry-After: 1")
+        aWriter.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") +
+                      body)
+        await aWriter.drain()
+
+async def serve(aArgs):
+    pool = TeXZillaWorkerPool(aArgs.workers, aArgs.concurrency,
+                              aArgs.queue_size, aArgs.timeout,
+                              aArgs.texzilla, aArgs.safe, aArgs.itexId,
+                              aArgs.profile,
+                              {"aMaxLength": aArgs.max_length,
+                               "aMaxDepth": aArgs.max_depth,
+                               "aMaxTokens": aArgs.max_tokens,
+                               "aMaxOutputSize": aArgs.max_output_size,
+                               "aTimeout": aArgs.budget})
+    server = TeXZillaServer(pool)
+    httpServer = await asyncio.start_server(server.handleConnection,
+                                            aArgs.host, aArgs.port,
+                                            backlog = aArgs.backlog)
+    print("Web server started on http://%s:%d" % (aArgs.host, aArgs.port))
+    try:
+        await httpServer.serve_forever()
+    finally:
+        httpServer.close()
+        pool.close()
+
+def main(aArgs):
+    parser = argparse.ArgumentParser(description = "TeXZilla Web server")
+    parser.add_argument("--host", default = "localhost")
+    parser.add_argument("--port", type = int, default = 3141)
+    parser.add_argument("--safe", action = "store_true")
+    parser.add_argument("--itexId", action = "store_true")
+    parser.add_argument("--workers", type = int, default = os.cpu_count(),
+                        help = "number of worker processes")
+    parser.add_argument("--concurrency", type = int, default = None,
+                        help = "maximum number of requests converted at the "
+                               "same time (default: number of workers)")
+    parser.add_argument("--queue-size", type = int, default = 128,
+                        help = "maximum number of requests waiting for a "
+                               "worker")
+    parser.add_argument("--backlog", type = int, default = 100,
+                        help = "maximum number of connections waiting to be "
+                               "accepted")
+    parser.add_argument("--timeout", type = float, default = 10,
+                        help = "maximum time in seconds to handle a request")
+    parser.add_argument("--profile", action = "store_true",
+                        help = "collect the statistics returned for GET "
+                               "/metrics")
+    parser.add_argument("--max-length", type = int, default = None,
+                        help = "maximum length of a formula")
+    parser.add_argument("--max-depth", type = int, default = None,
+                        help = "maximum nesting depth of a formula")
+    parser.add_argument("--max-tokens", type = int, default = None,
+                        help = "maximum number of tokens of a formula")
+    parser.add_argument("--max-output-size", type = int, default = None,
+                        help = "maximum length of the MathML output")
+    parser.add_argument("--budget", type = float, default = None,
+                        help = "maximum time in seconds to convert a formula "
+                               "before returning an error")
+    parser.add_argument("--texzilla", default = TEXZILLA_JS,
+                        help = "path to TeXZilla-min.js or TeXZilla.js")
+    args = parser.parse_args(aArgs)
+    if args.concurrency is None:
+        args.concurrency = args.workers
+    if WORKER_CONTEXT.get_start_method() == "forkserver":
+        # Make the forkserver preload an engine, see texzilla/forkserver.py.
+        os.environ["TEXZILLA_PRELOAD"] = os.path.abspath(args.texzilla)
+        WORKER_CONTEXT.set_forkserver_preload(["texzilla.forkserver"])
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,37 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+# Python interface to TeXZilla, running TeXZilla-min.js in the SpiderMonkey
+# module, see TeXZillaParser.py for the installation instructions.
+#
+# Keep a TeXZillaEngine around to convert many formulas without loading
+# TeXZilla again:
+#
+#   from texzilla import TeXZillaEngine
+#   engine = TeXZillaEngine()
+#   for tex in formulas:
+#       print(engine.to_mathml_string(tex))
+#
+# The safe and itex identifier modes can be set for the engine or for each
+# call. Threads can share a TeXZillaEnginePool. To find the slow formulas,
+# call engine.set_profiling(True) and read engine.get_statistics(). Forked
+# processes can reuse an engine loaded by their parent, see preloadEngine.
+#
+# To protect a service from huge or adversarial formulas, call e.g.
+# engine.set_limits(aMaxLength = 10000, aTimeout = 0.5): the conversions that
+# exceed a limit fail fast with the usual <merror> output.
+#
+# To convert many formulas over all the CPU cores, use iterateBatch or
+# convertBatch, and TeXZillaBulkConverter for large corpora of
+# newline-delimited JSON records.
+
+from .batch import convertBatch, iterateBatch, readFormulas
+from .bulk import TeXZillaBulkConverter
+from .cache import TeXZillaCache, getCacheKey
+from .engine import (MATHML_NAMESPACE, TEX_MIME_TYPES, TEXZILLA_JS,
+                     TeXZillaEngine, TeXZillaIncrementalFilter,
+                     TeXZillaStreamFilter)
+from .pool import TeXZillaEnginePool
+from .preload import createEngine, getBuildHash, preloadEngine
+from .statistics import mergeHistograms, mergeStatistics
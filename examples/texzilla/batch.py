@@ -0,0 +1,89 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+# Conversion of many formulas over a pool of worker processes.
+
+import itertools
+import multiprocessing
+import multiprocessing.util
+
+from .cache import TeXZillaCache
+from .engine import TEXZILLA_JS
+from .preload import (createEngine, isForkStartMethod, preloadEngine,
+                      preloadedEngines)
+
+# The engine of a batch worker process, created once by initBatchWorker.
+batchWorkerEngine = None
+
+def initBatchWorker(aTeXZillaJS, aCachePath):
+    global batchWorkerEngine
+    cache = None
+    if aCachePath is not None:
+        cache = TeXZillaCache(aPath = aCachePath)
+        # Save the pending cache entries when the worker exits.
+        multiprocessing.util.Finalize(cache, cache.close, exitpriority = 10)
+    batchWorkerEngine = createEngine(aTeXZillaJS, cache)
+
+def convertInBatchWorker(aParam):
+    # Convert one formula and keep the exception alongside the result, using
+    # the same keys as the TeXZilla web server.
+    tex, display, rtl, throwException = aParam
+    result = {"tex": tex, "mathml": None, "exception": None}
+    try:
+        result["mathml"] = batchWorkerEngine.to_mathml_string(tex, display, rtl,
+                                                              throwException)
+    except Exception as e:
+        result["exception"] = str(e)
+    return result
+
+def readFormulas(aFile):
+    # Read one formula per line.
+    for line in aFile:
+        yield line.rstrip("\r\n")
+
+def iterateBatch(aFormulas, aDisplay = False, aRTL = False,
+                 aThrowExceptionOnError = False, aProcesses = None,
+                 aChunkSize = 64, aTeXZillaJS = TEXZILLA_JS, aCachePath = None):
+    # Convert the formulas over a pool of worker processes, each of them with
+    # its own TeXZillaEngine, and yield the results in the input order.
+    # The input is consumed by windows so that only a bounded number of
+    # formulas is in flight. If aCachePath is specified, the workers share a
+    # persistent TeXZillaCache stored in that file.
+    if aProcesses is None:
+        aProcesses = multiprocessing.cpu_count()
+    window = aProcesses * aChunkSize * 4
+    params = ((tex, bool(aDisplay), bool(aRTL), bool(aThrowExceptionOnError))
+              for tex in aFormulas)
+    if isForkStartMethod():
+        # Load TeXZilla once for all the workers.
+        preloadEngine(aTeXZillaJS)
+    try:
+        pool = multiprocessing.Pool(aProcesses, initBatchWorker,
+                                    (aTeXZillaJS, aCachePath))
+    finally:
+        preloadedEngines.clear()
+    try:
+        while True:
+            chunk = list(itertools.islice(params, window))
+            if not chunk:
+                break
+            for result in pool.imap(convertInBatchWorker, chunk, aChunkSize):
+                yield result
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+def convertBatch(aFormulas, aDisplay = False, aRTL = False,
+                 aThrowExceptionOnError = False, aProcesses = None,
+                 aChunkSize = 64, aTeXZillaJS = TEXZILLA_JS, aCachePath = None):
+    # Same as iterateBatch but return the list of results. aFormulas may also
+    # be a file with one formula per line.
+    if hasattr(aFormulas, "readline"):
+        aFormulas = readFormulas(aFormulas)
+    return list(iterateBatch(aFormulas, aDisplay, aRTL,
+                             aThrowExceptionOnError, aProcesses, aChunkSize,
+                             aTeXZillaJS, aCachePath))
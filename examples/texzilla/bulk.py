@@ -0,0 +1,222 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+# Resumable conversion of corpora of newline-delimited JSON records.
+
+import binascii
+import collections
+import hashlib
+import io
+import json
+import mmap
+import os
+
+from .batch import iterateBatch
+from .engine import TEXZILLA_JS
+from .preload import getBuildHash
+
+def iterateLines(aMap):
+    # Yield the start and end offsets of the lines of a memory map, without
+    # their newline characters.
+    position = 0
+    size = len(aMap)
+    while position < size:
+        end = aMap.find(b"\n", position)
+        if end < 0:
+            end = size
+        yield (position, end)
+        position = end + 1
+
+def mapFile(aFile):
+    # Memory-map a file for reading. Empty files can not be mapped, so an
+    # empty bytes object is returned instead.
+    if os.fstat(aFile.fileno()).st_size == 0:
+        return b""
+    return mmap.mmap(aFile.fileno(), 0, access = mmap.ACCESS_READ)
+
+def closeMap(aMap):
+    if isinstance(aMap, mmap.mmap):
+        aMap.close()
+
+class TeXZillaBulkConverter:
+
+    # Convert a corpus stored as newline-delimited JSON, each line being a
+    # formula string or an object with the formula in its aField property.
+    # The output has one line per input line, with the "mathml" and
+    # "exception" properties added to the objects (the formula strings become
+    # {tex, mathml, exception} objects as for --batch). Blank lines are
+    # copied as empty lines.
+    #
+    # The input is memory-mapped and each distinct formula is converted only
+    # once by iterateBatch. The results are appended to a checkpoint file as
+    # they arrive, so that an interrupted conversion resumes where it stopped
+    # when it is run again. The output is then written line by line from the
+    # input and the checkpoint, and the checkpoint is removed.
+
+    def __init__(self, aInputPath, aOutputPath, aField = "tex",
+                 aDisplay = False, aRTL = False, aThrowExceptionOnError = False,
+                 aProcesses = None, aChunkSize = 64,
+                 aTeXZillaJS = TEXZILLA_JS, aCheckpointPath = None,
+                 aCheckpointInterval = 1000):
+        self.inputPath = aInputPath
+        self.outputPath = aOutputPath
+        self.field = aField
+        self.display = bool(aDisplay)
+        self.rtl = bool(aRTL)
+        self.throwException = bool(aThrowExceptionOnError)
+        self.processes = aProcesses
+        self.chunkSize = aChunkSize
+        self.texzillaJS = aTeXZillaJS
+        self.checkpointPath = aCheckpointPath
+        if self.checkpointPath is None:
+            self.checkpointPath = aOutputPath + ".checkpoint"
+        self.checkpointInterval = aCheckpointInterval
+        self.statistics = {"records": 0, "unique": 0, "resumed": 0,
+                           "converted": 0}
+
+    def getFormula(self, aRecord, aLineNumber):
+        if isinstance(aRecord, dict):
+            tex = aRecord.get(self.field)
+        else:
+            tex = aRecord
+        if not isinstance(tex, type(u"")):
+            raise ValueError("%s:%d: no formula found" %
+                             (self.inputPath, aLineNumber))
+        return tex
+
+    def getHeader(self):
+        # The checkpoint is only valid for the same build and options.
+        return json.dumps({"build": getBuildHash(self.texzillaJS),
+                           "display": self.display, "rtl": self.rtl,
+                           "throw": self.throwException},
+                          sort_keys = True)
+
+    def scan(self, aInput):
+        # Return the offsets of the first line of each distinct formula,
+        # indexed by the hash of the formula.
+        formulas = collections.OrderedDict()
+        for (lineNumber, (start, end)) in enumerate(iterateLines(aInput), 1):
+            if not aInput[start:end].strip():
+                continue
+            try:
+                record = json.loads(aInput[start:end].decode("utf-8"))
+            except ValueError:
+                raise ValueError("%s:%d: invalid JSON" %
+                                 (self.inputPath, lineNumber))
+            tex = self.getFormula(record, lineNumber)
+            key = hashlib.sha1(tex.encode("utf-8")).digest()
+            if key not in formulas:
+                formulas[key] = (start, end)
+            self.statistics["records"] += 1
+        self.statistics["unique"] = len(formulas)
+        return formulas
+
+    def readCheckpoint(self):
+        # Return the offsets of the results saved in the checkpoint, indexed
+        # by the hash of the formula, and the offset where the next results
+        # must be written. A line truncated by an interruption is ignored.
+        results = {}
+        if not os.path.exists(self.checkpointPath):
+            return (results, None)
+        with io.open(self.checkpointPath, "rb") as f:
+            checkpoint = mapFile(f)
+            try:
+                lines = iterateLines(checkpoint)
+                header = next(lines, None)
+                if (header is None or header[1] == len(checkpoint) or
+                    checkpoint[header[0]:header[1]].decode("utf-8") !=
+                    self.getHeader()):
+                    return (results, None)
+                validEnd = header[1] + 1
+                for (start, end) in lines:
+                    if end == len(checkpoint):
+                        break
+                    try:
+                        key = json.loads(checkpoint[start:end].decode("utf-8"))
+                    except ValueError:
+                        break
+                    results[binascii.unhexlify(key[0])] = (start, end)
+                    validEnd = end + 1
+            finally:
+                closeMap(checkpoint)
+        return (results, validEnd)
+
+    def convert(self, aInput, aFormulas):
+        # Convert the formulas without saved results and append the results
+        # to the checkpoint. Return the offsets of all the results.
+        (results, validEnd) = self.readCheckpoint()
+        self.statistics["resumed"] = len(results)
+        if validEnd is None:
+            checkpoint = io.open(self.checkpointPath, "wb")
+            checkpoint.write(self.getHeader().encode("utf-8") + b"\n")
+        else:
+            checkpoint = io.open(self.checkpointPath, "r+b")
+            checkpoint.truncate(validEnd)
+            checkpoint.seek(validEnd)
+        pending = [key for key in aFormulas if key not in results]
+        formulas = (self.getFormula(json.loads(
+                        aInput[start:end].decode("utf-8")), 0)
+                    for (start, end) in (aFormulas[key] for key in pending))
+        try:
+            batch = iterateBatch(formulas, self.display, self.rtl,
+                                 self.throwException, self.processes,
+                                 self.chunkSize, self.texzillaJS)
+            for key in pending:
+                result = next(batch)
+                line = json.dumps([binascii.hexlify(key).decode("ascii"),
+                                   result["mathml"],
+                                   result["exception"]]).encode("utf-8")
+                start = checkpoint.tell()
+                checkpoint.write(line + b"\n")
+                results[key] = (start, start + len(line))
+                self.statistics["converted"] += 1
+                if self.statistics["converted"] % self.checkpointInterval == 0:
+                    checkpoint.flush()
+                    os.fsync(checkpoint.fileno())
+        finally:
+            checkpoint.close()
+        return results
+
+    def write(self, aInput, aResults):
+        # Write the output line by line, with the results read from the
+        # memory-mapped checkpoint.
+        temporaryPath = self.outputPath + ".tmp"
+        with io.open(self.checkpointPath, "rb") as f, \
+             io.open(temporaryPath, "wb") as output:
+            checkpoint = mapFile(f)
+            try:
+                self.writeRecords(aInput, aResults, checkpoint, output)
+            finally:
+                closeMap(checkpoint)
+        os.rename(temporaryPath, self.outputPath)
+
+    def writeRecords(self, aInput, aResults, aCheckpoint, aOutput):
+        for (start, end) in iterateLines(aInput):
+            if not aInput[start:end].strip():
+                aOutput.write(b"\n")
+                continue
+            record = json.loads(aInput[start:end].decode("utf-8"))
+            tex = self.getFormula(record, 0)
+            (resultStart, resultEnd) = \
+                aResults[hashlib.sha1(tex.encode("utf-8")).digest()]
+            (key, mathml, exception) = \
+                json.loads(aCheckpoint[resultStart:resultEnd].decode("utf-8"))
+            if not isinstance(record, dict):
+                record = {"tex": tex}
+            record["mathml"] = mathml
+            record["exception"] = exception
+            aOutput.write(json.dumps(record).encode("utf-8") + b"\n")
+
+    def run(self):
+        # Convert the corpus and return the statistics of the conversion.
+        with io.open(self.inputPath, "rb") as f:
+            corpus = mapFile(f)
+            try:
+                formulas = self.scan(corpus)
+                results = self.convert(corpus, formulas)
+                self.write(corpus, results)
+            finally:
+                closeMap(corpus)
+        os.remove(self.checkpointPath)
+        return self.statistics
@@ -0,0 +1,114 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+# Cache of conversion results, in memory and optionally in a SQLite database.
+
+import collections
+import hashlib
+import json
+import sqlite3
+
+def getCacheKey(aBuildHash, aTeX, aDisplay, aRTL, aSafeMode,
+                aItexIdentifierMode, aThrowExceptionOnError, aLimits = None):
+    # The key of a conversion result in a TeXZillaCache.
+    param = [aBuildHash, aTeX, bool(aDisplay), bool(aRTL), bool(aSafeMode),
+             bool(aItexIdentifierMode), bool(aThrowExceptionOnError)]
+    if aLimits is not None:
+        param.append(list(aLimits))
+    return hashlib.sha1(json.dumps(param).encode("utf-8")).hexdigest()
+
+class TeXZillaCache:
+
+    # Cache of toMathMLString results indexed by getCacheKey. At most aMaxSize
+    # entries are kept in memory, the least recently used ones being evicted
+    # first. If aPath is specified, the entries are also saved in a SQLite
+    # database which can be reused after a restart or shared between
+    # processes. Since the keys include the hash of the TeXZilla build, the
+    # entries of a previous build are never returned.
+    #
+    # The new entries are kept in memory and written by groups of
+    # aCommitInterval, each group in a short transaction, so that the
+    # processes sharing the database do not wait for each other. If the
+    # database is locked anyway, a read is a miss and the written entries
+    # are dropped.
+
+    def __init__(self, aMaxSize = 10000, aPath = None, aCommitInterval = 100):
+        self.maxSize = aMaxSize
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.diskHits = 0
+        self.evictions = 0
+        self.databaseErrors = 0
+        self.database = None
+        self.commitInterval = aCommitInterval
+        self.pendingWrites = []
+        if aPath is not None:
+            self.database = sqlite3.connect(aPath, timeout = 5)
+            # With a write-ahead log, the readers do not wait for a writer.
+            self.database.execute("PRAGMA journal_mode=WAL")
+            with self.database:
+                self.database.execute("CREATE TABLE IF NOT EXISTS mathml "
+                                      "(key TEXT PRIMARY KEY, value TEXT)")
+
+    def get(self, aKey):
+        # Return the cached value or None.
+        if aKey in self.entries:
+            value = self.entries.pop(aKey)
+            self.entries[aKey] = value
+            self.hits += 1
+            return value
+        if self.database is not None:
+            try:
+                row = self.database.execute("SELECT value FROM mathml "
+                                            "WHERE key = ?",
+                                            (aKey,)).fetchone()
+            except sqlite3.OperationalError:
+                self.databaseErrors += 1
+                row = None
+            if row is not None:
+                self.hits += 1
+                self.diskHits += 1
+                self.putInMemory(aKey, row[0])
+                return row[0]
+        self.misses += 1
+        return None
+
+    def put(self, aKey, aValue):
+        self.putInMemory(aKey, aValue)
+        if self.database is not None:
+            self.pendingWrites.append((aKey, aValue))
+            if len(self.pendingWrites) >= self.commitInterval:
+                self.flush()
+
+    def putInMemory(self, aKey, aValue):
+        self.entries.pop(aKey, None)
+        self.entries[aKey] = aValue
+        while len(self.entries) > self.maxSize:
+            self.entries.popitem(last = False)
+            self.evictions += 1
+
+    def flush(self):
+        # Write the pending entries to the disk.
+        if self.database is not None and self.pendingWrites:
+            try:
+                with self.database:
+                    self.database.executemany("INSERT OR REPLACE INTO mathml "
+                                              "VALUES (?, ?)",
+                                              self.pendingWrites)
+            except sqlite3.OperationalError:
+                self.databaseErrors += 1
+            self.pendingWrites = []
+
+    def close(self):
+        self.flush()
+        if self.database is not None:
+            self.database.close()
+            self.database = None
+
+    def getStatistics(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "diskHits": self.diskHits, "evictions": self.evictions,
+                "databaseErrors": self.databaseErrors,
+                "size": len(self.entries)}
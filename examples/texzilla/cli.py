@@ -0,0 +1,81 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+# The --batch, --bulk and --streamfilter commands of TeXZillaParser.py.
+
+from __future__ import print_function
+import argparse
+import io
+import json
+import sys
+
+from .batch import iterateBatch, readFormulas
+from .bulk import TeXZillaBulkConverter
+from .engine import TEXZILLA_JS, TeXZillaEngine
+
+def batch(aArgs):
+    parser = argparse.ArgumentParser(prog = "TeXZillaParser.py --batch")
+    parser.add_argument("input", nargs = "?", type = argparse.FileType("r"),
+                        default = sys.stdin)
+    parser.add_argument("--display", action = "store_true")
+    parser.add_argument("--rtl", action = "store_true")
+    parser.add_argument("--throw", action = "store_true")
+    parser.add_argument("--processes", type = int, default = None)
+    parser.add_argument("--chunk-size", type = int, default = 64)
+    parser.add_argument("--cache", default = None)
+    args = parser.parse_args(aArgs)
+
+    for result in iterateBatch(readFormulas(args.input), args.display,
+                               args.rtl, args.throw, args.processes,
+                               args.chunk_size, TEXZILLA_JS, args.cache):
+        print(json.dumps(result))
+    args.input.close()
+
+def bulk(aArgs):
+    parser = argparse.ArgumentParser(prog = "TeXZillaParser.py --bulk")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--field", default = "tex")
+    parser.add_argument("--display", action = "store_true")
+    parser.add_argument("--rtl", action = "store_true")
+    parser.add_argument("--throw", action = "store_true")
+    parser.add_argument("--processes", type = int, default = None)
+    parser.add_argument("--chunk-size", type = int, default = 64)
+    parser.add_argument("--checkpoint", default = None)
+    args = parser.parse_args(aArgs)
+
+    converter = TeXZillaBulkConverter(args.input, args.output, args.field,
+                                      args.display, args.rtl, args.throw,
+                                      args.processes, args.chunk_size,
+                                      TEXZILLA_JS, args.checkpoint)
+    try:
+        statistics = converter.run()
+    except ValueError as e:
+        print(str(e), file = sys.stderr)
+        sys.exit(1)
+    print("%(records)d records, %(unique)d distinct formulas, "
+          "%(resumed)d resumed, %(converted)d converted" % statistics,
+          file = sys.stderr)
+
+def streamfilter(aArgs):
+    # Same as the streamfilter command of TeXZilla.js.
+    engine = TeXZillaEngine()
+    engine.set_safe_mode(len(aArgs) >= 1 and aArgs[0] == "true")
+    engine.set_itex_identifier_mode(len(aArgs) >= 2 and aArgs[1] == "true")
+    stdin = io.open(sys.stdin.fileno(), "r", encoding = "utf-8",
+                    closefd = False)
+    stdout = io.open(sys.stdout.fileno(), "w", encoding = "utf-8",
+                     closefd = False)
+    try:
+        engine.filter_stream(stdin, stdout, True)
+        stdout.write(u"\n")
+    except Exception as e:
+        stdout.flush()
+        print(str(e))
+        sys.exit(1)
+    finally:
+        stdout.flush()
+
+# The functions of the commands, indexed by their option.
+COMMANDS = {"--batch": batch, "--bulk": bulk, "--streamfilter": streamfilter}
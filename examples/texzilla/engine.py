@@ -0,0 +1,272 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+# TeXZillaEngine: TeXZilla loaded once in a SpiderMonkey context, with
+# wrappers for its stream and incremental filters.
+
+import hashlib
+import io
+import json
+import os
+import time
+import xml.dom.minidom
+import spidermonkey
+
+from .cache import getCacheKey
+
+TEXZILLA_JS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "..", "..", "TeXZilla-min.js")
+
+MATHML_NAMESPACE = "http://www.w3.org/1998/Math/MathML"
+TEX_MIME_TYPES = ["TeX", "LaTeX", "text/x-tex", "text/x-latex",
+                  "application/x-tex", "application/x-latex"]
+
+def getTeXSourceInternal(aElement):
+    # Python version of getTeXSourceInternal from TeXZilla.jison, working on
+    # xml.dom.minidom elements.
+    if aElement is None or aElement.namespaceURI != MATHML_NAMESPACE:
+        return None
+
+    children = [child for child in aElement.childNodes
+                if child.nodeType == child.ELEMENT_NODE]
+    if aElement.localName == "semantics":
+        for child in children:
+            if (child.namespaceURI == MATHML_NAMESPACE and
+                child.localName == "annotation" and
+                child.getAttribute("encoding") in TEX_MIME_TYPES):
+                return "".join(node.data for node in child.childNodes
+                               if node.nodeType in (node.TEXT_NODE,
+                                                    node.CDATA_SECTION_NODE))
+    elif len(children) == 1:
+        return getTeXSourceInternal(children[0])
+
+    return None
+
+class TeXZillaEngine:
+
+    # A SpiderMonkey context in which TeXZilla is loaded once. Conversions
+    # only pay for the parsing, so keep one engine around for all of them.
+    # A context must not be used by several threads at the same time.
+    # The results of to_mathml_string are saved in aCache, if specified.
+
+    def __init__(self, aTeXZillaJS = TEXZILLA_JS, aCache = None):
+        # Prepare the SpiderMonkey Javascript engine and load TeXZilla.js.
+        self.runtime = spidermonkey.Runtime()
+        self.context = self.runtime.new_context()
+        self.context.execute("var window = {}")
+        with io.open(aTeXZillaJS, "rb") as f:
+            source = f.read()
+        self.buildHash = hashlib.sha1(source).hexdigest()
+        self.context.execute(source.decode("utf-8"))
+        # TeXZilla-min.js exports window.TeXZilla while TeXZilla.js only
+        # defines the global TeXZilla variable.
+        self.context.execute("if (!window.TeXZilla &&"
+                             "    typeof TeXZilla !== 'undefined') {"
+                             "  window.TeXZilla = TeXZilla;"
+                             "}")
+        self.texzilla = self.context.execute("window.TeXZilla")
+        self.createOptions = self.context.execute(
+            "(function (aSafe, aItexId, aEscapeXML) {"
+            "  return {safe: aSafe, itexId: aItexId, escapeXML: aEscapeXML};"
+            "})")
+        self.createLimits = self.context.execute(
+            "(function (aMaxLength, aMaxDepth, aMaxTokens, aMaxOutputSize,"
+            "           aTimeout) {"
+            "  return {maxLength: aMaxLength, maxDepth: aMaxDepth,"
+            "          maxTokens: aMaxTokens, maxOutputSize: aMaxOutputSize,"
+            "          timeout: aTimeout};"
+            "})")
+        self.getStatisticsJSON = self.context.execute(
+            "(function () {"
+            "  return JSON.stringify(window.TeXZilla.getStatistics());"
+            "})")
+        self.cache = aCache
+        self.safeMode = False
+        self.itexIdentifierMode = False
+        self.limits = None
+
+    def set_safe_mode(self, aEnable):
+        self.safeMode = bool(aEnable)
+        self.texzilla.setSafeMode(self.safeMode)
+
+    def set_itex_identifier_mode(self, aEnable):
+        self.itexIdentifierMode = bool(aEnable)
+        self.texzilla.setItexIdentifierMode(self.itexIdentifierMode)
+
+    def getModes(self, aSafeMode, aItexIdentifierMode):
+        # Return the safe and itex identifier modes of one call to TeXZilla.
+        # The modes that are None are those of the engine.
+        if aSafeMode is None:
+            aSafeMode = self.safeMode
+        if aItexIdentifierMode is None:
+            aItexIdentifierMode = self.itexIdentifierMode
+        return bool(aSafeMode), bool(aItexIdentifierMode)
+
+    def getOptions(self, aSafeMode, aItexIdentifierMode, aEscapeXML = None):
+        # Create the options object of one call to TeXZilla.
+        safeMode, itexIdentifierMode = self.getModes(aSafeMode,
+                                                     aItexIdentifierMode)
+        return self.createOptions(safeMode, itexIdentifierMode,
+                                  bool(aEscapeXML))
+
+    def to_mathml_string(self, aTeX, aDisplay = False, aRTL = False,
+                         aThrowExceptionOnError = False, aSafeMode = None,
+                         aItexIdentifierMode = None):
+        # aSafeMode and aItexIdentifierMode override the modes of the engine
+        # for this call only.
+        safeMode, itexIdentifierMode = self.getModes(aSafeMode,
+                                                     aItexIdentifierMode)
+        options = self.createOptions(safeMode, itexIdentifierMode, False)
+        if self.cache is None:
+            return self.texzilla.toMathMLString(aTeX, bool(aDisplay),
+                                                bool(aRTL),
+                                                bool(aThrowExceptionOnError),
+                                                options)
+        key = getCacheKey(self.buildHash, aTeX, aDisplay, aRTL,
+                          safeMode, itexIdentifierMode,
+                          aThrowExceptionOnError, self.limits)
+        mathml = self.cache.get(key)
+        if mathml is None:
+            start = time.time()
+            mathml = self.texzilla.toMathMLString(aTeX, bool(aDisplay),
+                                                  bool(aRTL),
+                                                  bool(aThrowExceptionOnError),
+                                                  options)
+            # A conversion that used its whole time budget may have been
+            # stopped, depending on the load. Do not cache its result.
+            if (self.limits is None or self.limits[4] is None or
+                time.time() - start < self.limits[4]):
+                self.cache.put(key, mathml)
+        return mathml
+
+    def write_mathml(self, aTeX, aOutput, aDisplay = False, aRTL = False,
+                     aThrowExceptionOnError = False, aSafeMode = None,
+                     aItexIdentifierMode = None):
+        # Same as to_mathml_string, but the MathML output is written by chunks
+        # to the aOutput file object, so that the whole string is never held
+        # in memory. The cache is not used.
+        self.texzilla.writeMathML(aTeX, aOutput.write, bool(aDisplay),
+                                  bool(aRTL), bool(aThrowExceptionOnError),
+                                  self.getOptions(aSafeMode,
+                                                  aItexIdentifierMode))
+
+    def filter_string(self, aString, aThrowExceptionOnError = False,
+                      aSafeMode = None, aItexIdentifierMode = None,
+                      aEscapeXML = False):
+        return self.texzilla.filterString(aString,
+                                          bool(aThrowExceptionOnError),
+                                          self.getOptions(aSafeMode,
+                                                          aItexIdentifierMode,
+                                                          aEscapeXML))
+
+    def create_stream_filter(self, aThrowExceptionOnError = False,
+                             aSafeMode = None, aItexIdentifierMode = None,
+                             aEscapeXML = False):
+        return TeXZillaStreamFilter(self, aThrowExceptionOnError,
+                                    self.getOptions(aSafeMode,
+                                                    aItexIdentifierMode,
+                                                    aEscapeXML))
+
+    def create_incremental_filter(self, aThrowExceptionOnError = False,
+                                  aSafeMode = None, aItexIdentifierMode = None,
+                                  aEscapeXML = False):
+        return TeXZillaIncrementalFilter(self, aThrowExceptionOnError,
+                                         self.getOptions(aSafeMode,
+                                                         aItexIdentifierMode,
+                                                         aEscapeXML))
+
+    def filter_stream(self, aInput, aOutput, aThrowExceptionOnError = False,
+                      aChunkSize = 65536, aSafeMode = None,
+                      aItexIdentifierMode = None, aEscapeXML = False):
+        # Read aInput by chunks and write the filtered document to aOutput.
+        streamFilter = self.create_stream_filter(aThrowExceptionOnError,
+                                                 aSafeMode,
+                                                 aItexIdentifierMode,
+                                                 aEscapeXML)
+        while True:
+            chunk = aInput.read(aChunkSize)
+            if not chunk:
+                break
+            aOutput.write(streamFilter.write(chunk))
+        aOutput.write(streamFilter.end())
+
+    def set_limits(self, aMaxLength = None, aMaxDepth = None,
+                   aMaxTokens = None, aMaxOutputSize = None, aTimeout = None):
+        # Limit the resources of the next conversions, see TeXZilla.setLimits.
+        # aTimeout is the wall-clock budget of a conversion in seconds. The
+        # Javascript engine can not be interrupted from Python, so TeXZilla
+        # checks the deadline while lexing and serializing. The arguments that
+        # are None are not limited.
+        limits = (aMaxLength, aMaxDepth, aMaxTokens, aMaxOutputSize, aTimeout)
+        if all(value is None for value in limits):
+            self.limits = None
+            self.texzilla.setLimits(None)
+            return
+        self.limits = limits
+        self.texzilla.setLimits(self.createLimits(
+            aMaxLength, aMaxDepth, aMaxTokens, aMaxOutputSize,
+            None if aTimeout is None else aTimeout * 1000))
+
+    def set_profiling(self, aEnable):
+        # Enable or disable TeXZilla.setProfiling. The conversions read from
+        # the cache are not profiled.
+        self.texzilla.setProfiling(bool(aEnable))
+
+    def get_statistics(self):
+        # Return the statistics of TeXZilla.getStatistics as a dict, or None if
+        # profiling is disabled.
+        return json.loads(self.getStatisticsJSON())
+
+    def reset_statistics(self):
+        self.texzilla.resetStatistics()
+
+    def get_tex_source(self, aMathML):
+        # TeXZilla.getTeXSource needs a DOMParser, which SpiderMonkey does not
+        # provide. So parse the MathML string in Python instead.
+        try:
+            document = xml.dom.minidom.parseString(aMathML.encode("utf-8"))
+        except Exception:
+            return None
+        return getTeXSourceInternal(document.documentElement)
+
+class TeXZillaStreamFilter:
+
+    # Wrapper around TeXZilla.createStreamFilter: write() converts the math
+    # segments of a document as soon as they are complete, so that only the
+    # largest segment has to be kept in memory.
+
+    def __init__(self, aEngine, aThrowExceptionOnError = False,
+                 aOptions = None):
+        texzilla = aEngine.texzilla
+        self.streamFilter = texzilla.createStreamFilter(
+            bool(aThrowExceptionOnError), aOptions)
+
+    def write(self, aChunk):
+        return self.streamFilter.write(aChunk)
+
+    def end(self):
+        return self.streamFilter.end()
+
+class TeXZillaIncrementalFilter:
+
+    # Wrapper around TeXZilla.createIncrementalFilter: filter() converts
+    # successive versions of a document, e.g. while it is edited, and only
+    # the math segments that are new or modified are converted again.
+
+    def __init__(self, aEngine, aThrowExceptionOnError = False,
+                 aOptions = None):
+        texzilla = aEngine.texzilla
+        self.incrementalFilter = texzilla.createIncrementalFilter(
+            bool(aThrowExceptionOnError), aOptions)
+
+    def filter(self, aString):
+        return self.incrementalFilter.filter(aString)
+
+    def reset(self):
+        self.incrementalFilter.reset()
+
+    def getStatistics(self):
+        # The number of segments reused and converted by the last filter().
+        return {"reused": self.incrementalFilter.reused,
+                "converted": self.incrementalFilter.converted}
@@ -0,0 +1,15 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+# Module imported by the forkserver process of TeXZillaServer.py, see
+# multiprocessing.set_forkserver_preload. It loads an engine of the TeXZilla
+# build given by $TEXZILLA_PRELOAD, so that the worker processes forked from
+# the forkserver get it from createEngine instead of loading TeXZilla again.
+# Importing the other modules of the package never loads an engine.
+
+import os
+
+from .preload import preloadEngine
+
+preloadEngine(os.environ["TEXZILLA_PRELOAD"])
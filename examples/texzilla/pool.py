@@ -0,0 +1,84 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+# Thread-safe pool of engines.
+
+import contextlib
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from .cache import TeXZillaCache
+from .engine import TEXZILLA_JS, TeXZillaEngine
+
+class TeXZillaEnginePool:
+
+    # A thread-safe pool of at most aSize TeXZillaEngine, created on demand.
+    # A thread checks out an engine for its exclusive use and gives it back
+    # afterwards, so that conversions run in parallel. Use the per-call modes
+    # rather than set_safe_mode or set_itex_identifier_mode to serve requests
+    # with different settings. If aCacheSize is positive, each engine has an
+    # in-memory TeXZillaCache of that size. aLimits is a dict of keyword
+    # arguments of set_limits, applied to each engine.
+    #
+    #   pool = TeXZillaEnginePool(4)
+    #   with pool.checkout() as engine:
+    #       engine.to_mathml_string(tex, aSafeMode = True)
+
+    def __init__(self, aSize, aTeXZillaJS = TEXZILLA_JS, aCacheSize = 0,
+                 aLimits = None):
+        self.size = aSize
+        self.texzillaJS = aTeXZillaJS
+        self.cacheSize = aCacheSize
+        self.limits = aLimits
+        self.idleEngines = queue.Queue()
+        self.lock = threading.Lock()
+        self.engineCount = 0
+
+    def acquire(self, aTimeout = None):
+        # Return an idle engine, creating it if the pool is not full yet.
+        # Raise queue.Empty if none is available after aTimeout seconds.
+        try:
+            return self.idleEngines.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            create = self.engineCount < self.size
+            if create:
+                self.engineCount += 1
+        if create:
+            try:
+                cache = None
+                if self.cacheSize > 0:
+                    cache = TeXZillaCache(self.cacheSize)
+                engine = TeXZillaEngine(self.texzillaJS, cache)
+                if self.limits:
+                    engine.set_limits(**self.limits)
+                return engine
+            except Exception:
+                with self.lock:
+                    self.engineCount -= 1
+                raise
+        return self.idleEngines.get(timeout = aTimeout)
+
+    def release(self, aEngine):
+        self.idleEngines.put(aEngine)
+
+    @contextlib.contextmanager
+    def checkout(self, aTimeout = None):
+        engine = self.acquire(aTimeout)
+        try:
+            yield engine
+        finally:
+            self.release(engine)
+
+    def to_mathml_string(self, *aArgs, **aKeywords):
+        with self.checkout() as engine:
+            return engine.to_mathml_string(*aArgs, **aKeywords)
+
+    def filter_string(self, *aArgs, **aKeywords):
+        with self.checkout() as engine:
+            return engine.filter_string(*aArgs, **aKeywords)
@@ -0,0 +1,43 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+# Engines loaded once and inherited by forked processes.
+
+import hashlib
+import io
+import multiprocessing
+import os
+
+from .engine import TEXZILLA_JS, TeXZillaEngine
+
+# Engines loaded before forking worker processes, indexed by the hash of their
+# TeXZilla build. A forked process inherits this snapshot and does not have to
+# load TeXZilla again, see preloadEngine and createEngine.
+preloadedEngines = {}
+
+def getBuildHash(aTeXZillaJS):
+    with io.open(aTeXZillaJS, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def preloadEngine(aTeXZillaJS = TEXZILLA_JS):
+    # Load an engine to be inherited by the processes forked afterwards.
+    engine = TeXZillaEngine(aTeXZillaJS)
+    preloadedEngines[engine.buildHash] = engine
+    return engine
+
+def createEngine(aTeXZillaJS = TEXZILLA_JS, aCache = None):
+    # Return the preloaded engine of the same TeXZilla build if any, or a new
+    # engine otherwise. A preloaded engine is only returned once per process.
+    engine = preloadedEngines.pop(getBuildHash(aTeXZillaJS), None)
+    if engine is None:
+        return TeXZillaEngine(aTeXZillaJS, aCache)
+    engine.cache = aCache
+    return engine
+
+def isForkStartMethod():
+    # Whether the worker processes are forked and inherit preloadedEngines.
+    try:
+        return multiprocessing.get_start_method() == "fork"
+    except AttributeError:
+        return os.name == "posix"
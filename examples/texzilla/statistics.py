@@ -0,0 +1,44 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+# Merge the profiling statistics of several engines.
+
+import itertools
+
+def mergeHistograms(aHistograms):
+    # Merge histograms with the same bounds, as created by TeXZilla.
+    merged = {"count": 0, "sum": 0, "min": None, "max": None,
+              "bounds": aHistograms[0]["bounds"],
+              "counts": [0] * len(aHistograms[0]["counts"])}
+    for histogram in aHistograms:
+        merged["count"] += histogram["count"]
+        merged["sum"] += histogram["sum"]
+        for i, count in enumerate(histogram["counts"]):
+            merged["counts"][i] += count
+        for key, better in (("min", min), ("max", max)):
+            if histogram[key] is not None:
+                merged[key] = (histogram[key] if merged[key] is None else
+                               better(merged[key], histogram[key]))
+    return merged
+
+def mergeStatistics(aStatistics, aSlowestCount = 10):
+    # Merge the statistics of several engines, e.g. those of the workers of
+    # a server. The statistics that are None (profiling disabled) are
+    # ignored and None is returned if there is none left.
+    aStatistics = [statistics for statistics in aStatistics
+                   if statistics is not None]
+    if not aStatistics:
+        return None
+    merged = {}
+    for key in ["conversions", "errors", "exceptions"]:
+        merged[key] = sum(statistics[key] for statistics in aStatistics)
+    merged["histograms"] = {}
+    for name in aStatistics[0]["histograms"]:
+        merged["histograms"][name] = mergeHistograms(
+            [statistics["histograms"][name] for statistics in aStatistics])
+    slowest = itertools.chain(*[statistics["slowest"]
+                                for statistics in aStatistics])
+    merged["slowest"] = sorted(slowest, key = lambda item: item["total"],
+                               reverse = True)[:aSlowestCount]
+    return merged
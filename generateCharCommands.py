@@ -7,8 +7,16 @@
 
 from __future__ import print_function
 import argparse
+import filecmp
+import hashlib
+import json
+import os
 import re
 import sys
+try:
+    import xml.etree.cElementTree as ElementTree
+except ImportError:
+    import xml.etree.ElementTree as ElementTree
 
 def isItalicizableLowerCaseLatinLetter(aCodePoint):
     return ((0x61 <= aCodePoint and aCodePoint <= 0x7A) or
@@ -25,330 +33,182 @@ def isItalicizableUpperCaseGreekLetter(aCodePoint):
     return ((0x391 <= aCodePoint and aCodePoint <= 0x03A1) or
             (0x3A3 <= aCodePoint and aCodePoint <= 0x03A9))
 
+# Custom mathclass of some characters, indexed by code points. We
+# define/redefine some mathclass that are absent from unicode.xml or that are
+# different from what itex2MML does.
+CUSTOM_MATHCLASS = {}
+for codePoint in range(0x41, 0x3FA):
+    if isItalicizableLowerCaseLatinLetter(codePoint):
+        CUSTOM_MATHCLASS[(codePoint,)] = "AILL"
+    elif isItalicizableUpperCaseLatinLetter(codePoint):
+        CUSTOM_MATHCLASS[(codePoint,)] = "AIUL"
+    elif isItalicizableLowerCaseGreekLetter(codePoint):
+        CUSTOM_MATHCLASS[(codePoint,)] = "AILG"
+    elif isItalicizableUpperCaseGreekLetter(codePoint):
+        CUSTOM_MATHCLASS[(codePoint,)] = "AIUG"
+for codePoint in [0x0023, 0x2020, 0x2021, 0x214B,
+                  0x2305, 0x2306, 0x2322, 0x2323, 0x23B0, 0x23B1,
+                  0x25CA, 0x25CB,
+                  0x2605, 0x2660, 0x2661, 0x2662, 0x2663,
+                  0x27F2, 0x27F3]:
+    CUSTOM_MATHCLASS[(codePoint,)] = "OP"
+for codePoint in [0x2032, 0x2033, 0x2034, 0x2035, 0x2057]:
+    CUSTOM_MATHCLASS[(codePoint,)] = "OPP"
+for codePoint in [0x0024, 0x0025, 0x0026, 0x00F0, 0x03C2, 0x210F, 0x2127,
+                  0x2205]:
+    CUSTOM_MATHCLASS[(codePoint,)] = "A"
+CUSTOM_MATHCLASS[(0x221E,)] = "NUM"
+for codePoint in [(0x003D, 0x2237),
+                  (0x2268, 0xFE00), (0x2269, 0xFE00),
+                  (0x228A, 0xFE00), (0x228B, 0xFE00),
+                  (0x2ACB, 0xFE00), (0x2ACC, 0xFE00)]:
+    CUSTOM_MATHCLASS[codePoint] = "OP"
+
 def customMathClass(aCodePoint):
+    return CUSTOM_MATHCLASS.get(tuple(aCodePoint))
 
-    # We define/redefine some mathclass that are absent from unicode.xml or
-    # that are different from what itex2MML does.
-
-    if len(aCodePoint) == 1:
-        if (aCodePoint[0] == 0x221E):
-            return "NUM"
-        elif (aCodePoint[0] in
-              [0x0024, 0x0025, 0x0026, 0x00F0, 0x03C2, 0x210F, 0x2127, 0x2205]):
-            return "A"
-        elif isItalicizableLowerCaseLatinLetter(aCodePoint[0]):
-            return "AILL"
-        elif isItalicizableUpperCaseLatinLetter(aCodePoint[0]):
-            return "AIUL"
-        elif isItalicizableLowerCaseGreekLetter(aCodePoint[0]):
-            return "AILG"
-        elif isItalicizableUpperCaseGreekLetter(aCodePoint[0]):
-            return "AIUG"
-        elif (aCodePoint[0] in [0x0023, 0x2020, 0x2021, 0x214B,
-                                0x2305, 0x2306, 0x2322, 0x2323, 0x23B0, 0x23B1,
-                                0x25CA, 0x25CB,
-                                0x2605, 0x2660, 0x2661, 0x2662, 0x2663,
-                                0x27F2, 0x27F3]):
-            return "OP"
-        elif (aCodePoint[0] in [0x2032, 0x2033, 0x2034, 0x2035, 0x2057]):
-            return "OPP"
-
-    if len(aCodePoint) == 2:
-        if ((aCodePoint[0] == 0x003D and aCodePoint[1] == 0x2237) or
-            (aCodePoint[0] == 0x2268 and aCodePoint[1] == 0xFE00) or
-            (aCodePoint[0] == 0x2269 and aCodePoint[1] == 0xFE00) or
-            (aCodePoint[0] == 0x228A and aCodePoint[1] == 0xFE00) or
-            (aCodePoint[0] == 0x228B and aCodePoint[1] == 0xFE00) or
-            (aCodePoint[0] == 0x2ACB and aCodePoint[1] == 0xFE00) or
-            (aCodePoint[0] == 0x2ACC and aCodePoint[1] == 0xFE00)):
-            return "OP"
-
-    return None
+# Commands of unicode.xml that do not generate a single character.
+NON_CHARACTER_COMMANDS = set(["\\overbrace", "\\underbrace", "\\hat"])
 
 def isLaTeXCharacterCommand(aCommand):
-
-    # We exclude commands that do not generate a single character.
-    if (command == "\\overbrace" or
-        command == "\\underbrace" or
-        command == "\\hat"):
-        return False
-
-    return True
+    return aCommand not in NON_CHARACTER_COMMANDS
+
+# LaTeX commands defined in itex2MML that we add to the ones of unicode.xml,
+# indexed by code points.
+EXTRA_LATEX_COMMANDS = {
+    (0x0023,): ["\\#"],
+    (0x0024,): ["\\$"],
+    (0x0025,): ["\\%"],
+    (0x0026,): ["\\&"],
+    (0x003C,): ["\\lt"],
+    (0x003E,): ["\\gt"],
+    (0x007B,): ["\\{"],
+    (0x007D,): ["\\}"],
+    (0x00AC,): ["\\not"],
+    (0x00F0,): ["\\eth"],
+    (0x0237,): ["\\jmath"],
+    (0x0391,): ["\\Alpha"],
+    (0x0392,): ["\\Beta"],
+    (0x0396,): ["\\Zeta"],
+    (0x0397,): ["\\Eta"],
+    (0x0399,): ["\\Iota"],
+    (0x039A,): ["\\Kappa"],
+    (0x039C,): ["\\Mu"],
+    (0x039D,): ["\\Nu"],
+    (0x03A1,): ["\\Rho"],
+    (0x03A4,): ["\\Tau"],
+    (0x03D1,): ["\\vartheta"],
+    (0x03D2,): ["\\Upsi"],
+    (0x2016,): ["\\|"],
+    (0x2022,): ["\\bullet"],
+    (0x2026,): ["\\ldots"],
+    (0x2032,): ["'"],
+    (0x2033,): ["''"],
+    (0x2034,): ["'''"],
+    (0x2057,): ["''''"],
+    (0x210F,): ["\\hbar"],
+    (0x2127,): ["\\mho"],
+    (0x2134,): ["\\omicron"],
+    (0x214B,): ["\\invamp", "\\parr"],
+    (0x2192,): ["\\to"],
+    (0x2191,): ["\\uparr"],
+    (0x2193,): ["\\darr"],
+    (0x2195,): ["\\downuparrow", "\\duparr", "\\updarr"],
+    (0x2196,): ["\\nwarr"],
+    (0x2197,): ["\\nearr"],
+    (0x2198,): ["\\searr"],
+    (0x2199,): ["\\swarr"],
+    (0x21AA,): ["\\embedsin"],
+    (0x21A6,): ["\\map"],
+    (0x21D0,): ["\\impliedby"],
+    (0x21D2,): ["\\implies"],
+    (0x21D6,): ["\\nwArrow", "\\nwArr"],
+    (0x21D7,): ["\\neArrow", "\\neArr"],
+    (0x21D8,): ["\\seArrow", "\\seArr"],
+    (0x21D9,): ["\\swArrow", "\\swArr"],
+    (0x2205,): ["\\empty", "\\emptyset"],
+    (0x2207,): ["\\Del"],
+    (0x220C,): ["\\notni"],
+    (0x220F,): ["\\product"],
+    (0x2210,): ["\\coproduct"],
+    (0x2212,): ["-"],
+    (0x2216,): ["\\smallsetminus"],
+    (0x221D,): ["\\varpropto"],
+    (0x221E,): ["\\infinity"],
+    (0x2223,): ["\\shortmid"],
+    (0x2224,): ["\\nshortmid"],
+    (0x2225,): ["\\shortparallel"],
+    (0x2226,): ["\\nshortparallel"],
+    (0x2229,): ["\\intersection"],
+    (0x222A,): ["\\union"],
+    (0x222B,): ["\\integral"],
+    (0x222C,): ["\\doubleintegral"],
+    (0x222D,): ["\\tripleintegral"],
+    (0x222E,): ["\\conint", "\\contourintegral"],
+    (0x2237,): ["\\dblcolon"],
+    (0x223C,): ["\\thicksim"],
+    (0x2248,): ["\\thickapprox"],
+    (0x2251,): ["\\doteqdot"],
+    (0x2254,): ["\\coloneqq"],
+    (0x2255,): ["\\eqqcolon"],
+    (0x2260,): ["\\neq"],
+    (0x2264,): ["\\leq"],
+    (0x2265,): ["\\geq"],
+    (0x2288,): ["\\nsubseteqq"],
+    (0x229D,): ["\\odash"],
+    (0x229E,): ["\\plusb"],
+    (0x229F,): ["\\minusb"],
+    (0x22A0,): ["\\timesb"],
+    (0x22A5,): ["\\bottom", "\\bot"],
+    (0x22AB,): ["\\VDash"],
+    (0x22B2,): ["\\lhd"],
+    (0x22B3,): ["\\rhd"],
+    (0x22B4,): ["\\unlhd"],
+    (0x22B5,): ["\\unrhd"],
+    (0x22C0,): ["\\Wedge"],
+    (0x22C1,): ["\\Vee"],
+    (0x22C2,): ["\\Intersection"],
+    (0x22C3,): ["\\Union"],
+    (0x22C4,): ["\\Diamond"],
+    (0x22D8,): ["\\lll"],
+    (0x22F0,): ["\\udots"],
+    (0x2306,): ["\\doublebarwedge"],
+    (0x2322,): ["\\smallfrown"],
+    (0x2323,): ["\\smallsmile"],
+    (0x25A1,): ["\\Box"],
+    (0x25AA,): ["\\qed"],
+    (0x25B5,): ["\\triangle"],
+    (0x27E8,): ["\\lang", "\\langle"],
+    (0x27E9,): ["\\rang", "\\rangle"],
+    (0x27EA,): ["\\llangle"],
+    (0x27EB,): ["\\rrangle"],
+    (0x27F2,): ["\\righttoleftarrow"],
+    (0x27F3,): ["\\lefttorightarrow"],
+    (0x27FA,): ["\\iff"],
+    (0x290E,): ["\\dashleftarrow"],
+    (0x290F,): ["\\dashrightarrow"],
+    (0x293B,): ["\\curvearrowbotright"],
+    (0x2A0C,): ["\\quadrupleintegral"],
+    (0x2A2D,): ["\\Oplus"],
+    (0x2A34,): ["\\Otimes"],
+    (0x2A74,): ["\\Coloneqq"],
+    (0x2AEB,): ["\\Perp", "\\Vbar"],
+    (0x2AFC,): ["\\biginterleave"],
+    (0x2AFD,): ["\\sslash"],
+    (0x003D, 0x2237): ["\\Eqcolon"],
+    (0x2268, 0xFE00): ["\\lvertneqq"],
+    (0x2269, 0xFE00): ["\\gvertneqq"],
+    (0x228A, 0xFE00): ["\\varsubsetneq"],
+    (0x2A7D, 0x0338): ["\\nleqq"],
+    (0x2A7E, 0x0338): ["\\ngeqq"],
+    (0x2ACB, 0xFE00): ["\\varsubsetneqq"],
+    (0x2ACC, 0xFE00): ["\\varsupsetneqq"]
+}
 
 def addLaTeXCommands(aCodePoint, aLaTeXCommands):
 
     # We add some LaTeX commands defined in itex2MML
-
-    if len(aCodePoint) == 1:
-        if aCodePoint[0] == 0x0023:
-            aLaTeXCommands.append("\\#")
-        elif aCodePoint[0] == 0x0024:
-            aLaTeXCommands.append("\\$")
-        elif aCodePoint[0] == 0x0025:
-            aLaTeXCommands.append("\\%")
-        elif aCodePoint[0] == 0x0026:
-            aLaTeXCommands.append("\\&")
-        elif aCodePoint[0] == 0x003C:
-            aLaTeXCommands.append("\\lt")
-        elif aCodePoint[0] == 0x003E:
-            aLaTeXCommands.append("\\gt")
-        elif aCodePoint[0] == 0x007B:
-            aLaTeXCommands.append("\\{")
-        elif aCodePoint[0] == 0x007D:
-            aLaTeXCommands.append("\\}")
-        elif aCodePoint[0] == 0x00AC:
-            aLaTeXCommands.append("\\not")
-        elif aCodePoint[0] == 0x00F0:
-            aLaTeXCommands.append("\\eth")
-        elif aCodePoint[0] == 0x0237:
-            aLaTeXCommands.append("\\jmath")
-        elif aCodePoint[0] == 0x0391:
-            aLaTeXCommands.append("\\Alpha")
-        elif aCodePoint[0] == 0x0392:
-            aLaTeXCommands.append("\\Beta")
-        elif aCodePoint[0] == 0x0396:
-            aLaTeXCommands.append("\\Zeta")
-        elif aCodePoint[0] == 0x0397:
-            aLaTeXCommands.append("\\Eta")
-        elif aCodePoint[0] == 0x0399:
-            aLaTeXCommands.append("\\Iota")
-        elif aCodePoint[0] == 0x039A:
-            aLaTeXCommands.append("\\Kappa")
-        elif aCodePoint[0] == 0x039C:
-            aLaTeXCommands.append("\\Mu")
-        elif aCodePoint[0] == 0x039D:
-            aLaTeXCommands.append("\\Nu")
-        elif aCodePoint[0] == 0x03A1:
-            aLaTeXCommands.append("\\Rho")
-        elif aCodePoint[0] == 0x03A4:
-            aLaTeXCommands.append("\\Tau")
-        elif aCodePoint[0] == 0x03D1:
-            aLaTeXCommands.append("\\vartheta")
-        elif aCodePoint[0] == 0x03D2:
-            aLaTeXCommands.append("\\Upsi")
-        elif aCodePoint[0] == 0x2016:
-            aLaTeXCommands.append("\\|")
-        elif aCodePoint[0] == 0x2022:
-            aLaTeXCommands.append("\\bullet")
-        elif aCodePoint[0] == 0x2026:
-            aLaTeXCommands.append("\\ldots")
-        elif aCodePoint[0] == 0x2032:
-            aLaTeXCommands.append("'")
-        elif aCodePoint[0] == 0x2033:
-            aLaTeXCommands.append("''")
-        elif aCodePoint[0] == 0x2034:
-            aLaTeXCommands.append("'''")
-        elif aCodePoint[0] == 0x2057:
-            aLaTeXCommands.append("''''")
-        elif aCodePoint[0] == 0x210F:
-            aLaTeXCommands.append("\\hbar")
-        elif aCodePoint[0] == 0x2127:
-            aLaTeXCommands.append("\\mho")
-        elif aCodePoint[0] == 0x2134:
-            aLaTeXCommands.append("\\omicron")
-        elif aCodePoint[0] == 0x214B:
-            aLaTeXCommands.append("\\invamp")
-            aLaTeXCommands.append("\\parr")
-        elif aCodePoint[0] == 0x2192:
-            aLaTeXCommands.append("\\to")
-        elif aCodePoint[0] == 0x2191:
-            aLaTeXCommands.append("\\uparr")
-        elif aCodePoint[0] == 0x2193:
-            aLaTeXCommands.append("\\darr")
-        elif aCodePoint[0] == 0x2195:
-            aLaTeXCommands.append("\\downuparrow")
-            aLaTeXCommands.append("\\duparr")
-            aLaTeXCommands.append("\\updarr")
-        elif aCodePoint[0] == 0x2196:
-            aLaTeXCommands.append("\\nwarr")
-        elif aCodePoint[0] == 0x2197:
-            aLaTeXCommands.append("\\nearr")
-        elif aCodePoint[0] == 0x2198:
-            aLaTeXCommands.append("\\searr")
-        elif aCodePoint[0] == 0x2199:
-            aLaTeXCommands.append("\\swarr")
-        elif aCodePoint[0] == 0x21AA:
-            aLaTeXCommands.append("\\embedsin")
-        elif aCodePoint[0] == 0x21A6:
-            aLaTeXCommands.append("\\map")
-        elif aCodePoint[0] == 0x21D0:
-            aLaTeXCommands.append("\\impliedby")
-        elif aCodePoint[0] == 0x21D2:
-            aLaTeXCommands.append("\\implies")
-        elif aCodePoint[0] == 0x21D6:
-            aLaTeXCommands.append("\\nwArrow")
-            aLaTeXCommands.append("\\nwArr")
-        elif aCodePoint[0] == 0x21D7:
-            aLaTeXCommands.append("\\neArrow")
-            aLaTeXCommands.append("\\neArr")
-        elif aCodePoint[0] == 0x21D8:
-            aLaTeXCommands.append("\\seArrow")
-            aLaTeXCommands.append("\\seArr")
-        elif aCodePoint[0] == 0x21D9:
-            aLaTeXCommands.append("\\swArrow")
-            aLaTeXCommands.append("\\swArr")
-        elif aCodePoint[0] == 0x2205:
-            aLaTeXCommands.append("\\empty")
-            aLaTeXCommands.append("\\emptyset")
-        elif aCodePoint[0] == 0x2207:
-            aLaTeXCommands.append("\\Del")
-        elif aCodePoint[0] == 0x220C:
-            aLaTeXCommands.append("\\notni")
-        elif aCodePoint[0] == 0x220F:
-            aLaTeXCommands.append("\\product")
-        elif aCodePoint[0] == 0x2210:
-            aLaTeXCommands.append("\\coproduct")
-        elif aCodePoint[0] == 0x2212:
-            aLaTeXCommands.append("-")
-        elif aCodePoint[0] == 0x2216:
-            aLaTeXCommands.append("\\smallsetminus")
-        elif aCodePoint[0] == 0x221D:
-            aLaTeXCommands.append("\\varpropto")
-        elif aCodePoint[0] == 0x221E:
-            aLaTeXCommands.append("\\infinity")
-        elif aCodePoint[0] == 0x2223:
-            aLaTeXCommands.append("\\shortmid")
-        elif aCodePoint[0] == 0x2224:
-            aLaTeXCommands.append("\\nshortmid")
-        elif aCodePoint[0] == 0x2225:
-            aLaTeXCommands.append("\\shortparallel")
-        elif aCodePoint[0] == 0x2226:
-            aLaTeXCommands.append("\\nshortparallel")
-        elif aCodePoint[0] == 0x2229:
-            aLaTeXCommands.append("\\intersection")
-        elif aCodePoint[0] == 0x222A:
-            aLaTeXCommands.append("\\union")
-        elif aCodePoint[0] == 0x222B:
-            aLaTeXCommands.append("\\integral")
-        elif aCodePoint[0] == 0x222C:
-            aLaTeXCommands.append("\\doubleintegral")
-        elif aCodePoint[0] == 0x222D:
-            aLaTeXCommands.append("\\tripleintegral")
-        elif aCodePoint[0] == 0x222E:
-            aLaTeXCommands.append("\\conint")
-            aLaTeXCommands.append("\\contourintegral")
-        elif aCodePoint[0] == 0x2237:
-            aLaTeXCommands.append("\\dblcolon")
-        elif aCodePoint[0] == 0x223C:
-            aLaTeXCommands.append("\\thicksim")
-        elif aCodePoint[0] == 0x2248:
-            aLaTeXCommands.append("\\thickapprox")
-        elif aCodePoint[0] == 0x2251:
-            aLaTeXCommands.append("\\doteqdot")
-        elif aCodePoint[0] == 0x2254:
-            aLaTeXCommands.append("\\coloneqq")
-        elif aCodePoint[0] == 0x2255:
-            aLaTeXCommands.append("\\eqqcolon")
-        elif aCodePoint[0] == 0x2260:
-            aLaTeXCommands.append("\\neq")
-        elif aCodePoint[0] == 0x2264:
-            aLaTeXCommands.append("\\leq")
-        elif aCodePoint[0] == 0x2265:
-            aLaTeXCommands.append("\\geq")
-        elif aCodePoint[0] == 0x2288:
-            aLaTeXCommands.append("\\nsubseteqq")
-        elif aCodePoint[0] == 0x229D:
-            aLaTeXCommands.append("\\odash")
-        elif aCodePoint[0] == 0x229E:
-            aLaTeXCommands.append("\\plusb")
-        elif aCodePoint[0] == 0x229F:
-            aLaTeXCommands.append("\\minusb")
-        elif aCodePoint[0] == 0x22A0:
-            aLaTeXCommands.append("\\timesb")
-        elif aCodePoint[0] == 0x22A5:
-            aLaTeXCommands.append("\\bottom")
-            aLaTeXCommands.append("\\bot")
-        elif aCodePoint[0] == 0x22AB:
-            aLaTeXCommands.append("\\VDash")
-        elif aCodePoint[0] == 0x22B2:
-            aLaTeXCommands.append("\\lhd")
-        elif aCodePoint[0] == 0x22B3:
-            aLaTeXCommands.append("\\rhd")
-        elif aCodePoint[0] == 0x22B4:
-            aLaTeXCommands.append("\\unlhd")
-        elif aCodePoint[0] == 0x22B5:
-            aLaTeXCommands.append("\\unrhd")
-        elif aCodePoint[0] == 0x22C0:
-            aLaTeXCommands.append("\\Wedge")
-        elif aCodePoint[0] == 0x22C1:
-            aLaTeXCommands.append("\\Vee")
-        elif aCodePoint[0] == 0x22C2:
-            aLaTeXCommands.append("\\Intersection")
-        elif aCodePoint[0] == 0x22C3:
-            aLaTeXCommands.append("\\Union")
-        elif aCodePoint[0] == 0x22C4:
-            aLaTeXCommands.append("\\Diamond")
-        elif aCodePoint[0] == 0x22D8:
-            aLaTeXCommands.append("\\lll")
-        elif aCodePoint[0] == 0x22F0:
-            aLaTeXCommands.append("\\udots")
-        elif aCodePoint[0] == 0x2306:
-            aLaTeXCommands.append("\\doublebarwedge")
-        elif aCodePoint[0] == 0x2322:
-            aLaTeXCommands.append("\\smallfrown")
-        elif aCodePoint[0] == 0x2323:
-            aLaTeXCommands.append("\\smallsmile")
-        elif aCodePoint[0] == 0x25A1:
-            aLaTeXCommands.append("\\Box")
-        elif aCodePoint[0] == 0x25AA:
-            aLaTeXCommands.append("\\qed")
-        elif aCodePoint[0] == 0x25B5:
-            aLaTeXCommands.append("\\triangle")
-        elif aCodePoint[0] == 0x27E8:
-            aLaTeXCommands.append("\\lang")
-            aLaTeXCommands.append("\\langle")
-        elif aCodePoint[0] == 0x27E9:
-            aLaTeXCommands.append("\\rang")
-            aLaTeXCommands.append("\\rangle")
-        elif aCodePoint[0] == 0x27EA:
-            aLaTeXCommands.append("\\llangle")
-        elif aCodePoint[0] == 0x27EB:
-            aLaTeXCommands.append("\\rrangle")
-        elif aCodePoint[0] == 0x27F2:
-            aLaTeXCommands.append("\\righttoleftarrow")
-        elif aCodePoint[0] == 0x27F3:
-            aLaTeXCommands.append("\\lefttorightarrow")
-        elif aCodePoint[0] == 0x27FA:
-            aLaTeXCommands.append("\\iff")
-        elif aCodePoint[0] == 0x290E:
-            aLaTeXCommands.append("\\dashleftarrow")
-        elif aCodePoint[0] == 0x290F:
-            aLaTeXCommands.append("\\dashrightarrow")
-        elif aCodePoint[0] == 0x293B:
-            aLaTeXCommands.append("\\curvearrowbotright")
-        elif aCodePoint[0] == 0x2A0C:
-            aLaTeXCommands.append("\\quadrupleintegral")
-        elif aCodePoint[0] == 0x2A2D:
-            aLaTeXCommands.append("\\Oplus")
-        elif aCodePoint[0] == 0x2A34:
-            aLaTeXCommands.append("\\Otimes")
-        elif aCodePoint[0] == 0x2A74:
-            aLaTeXCommands.append("\\Coloneqq")
-        elif aCodePoint[0] == 0x2AEB:
-            aLaTeXCommands.append("\\Perp")
-            aLaTeXCommands.append("\\Vbar")
-        elif aCodePoint[0] == 0x2AFC:
-            aLaTeXCommands.append("\\biginterleave")
-        elif aCodePoint[0] == 0x2AFD:
-            aLaTeXCommands.append("\\sslash")
-
-    if len(aCodePoint) == 2:
-        if aCodePoint[0] == 0x003D and aCodePoint[1] == 0x2237:
-            aLaTeXCommands.append("\\Eqcolon")
-        elif aCodePoint[0] == 0x2268 and aCodePoint[1] == 0xFE00:
-            aLaTeXCommands.append("\\lvertneqq")
-        elif aCodePoint[0] == 0x2269 and aCodePoint[1] == 0xFE00:
-            aLaTeXCommands.append("\\gvertneqq")
-        elif aCodePoint[0] == 0x228A and aCodePoint[1] == 0xFE00:
-            aLaTeXCommands.append("\\varsubsetneq")
-        elif aCodePoint[0] == 0x2A7D and aCodePoint[1] == 0x0338:
-            aLaTeXCommands.append("\\nleqq")
-        elif aCodePoint[0] == 0x2A7E and aCodePoint[1] == 0x0338:
-            aLaTeXCommands.append("\\ngeqq")
-        elif aCodePoint[0] == 0x2ACB and aCodePoint[1] == 0xFE00:
-            aLaTeXCommands.append("\\varsubsetneqq")
-        elif aCodePoint[0] == 0x2ACC and aCodePoint[1] == 0xFE00:
-            aLaTeXCommands.append("\\varsupsetneqq")
+    aLaTeXCommands.extend(EXTRA_LATEX_COMMANDS.get(tuple(aCodePoint), []))
 
 class surrogatePair:
     def __init__(self, aHigh, aLow):
@@ -425,7 +285,7 @@ class UnicodeRange:
 
         # Concatenate lowRanges for each high surrogate.
         s = ""
-        for high in self.lowRange:
+        for high in sorted(self.lowRange):
             s += "|"
             if high > 0:
                 s += getJS(high)
@@ -444,18 +304,507 @@ class UnicodeRange:
 
         return s
 
+class SymbolIndex:
+
+    def __init__(self):
+        # rule, code points and token indexed by command
+        self.commands = dict()
+
+    def add(self, aCommand, aCodePoint, aToken, aRule):
+        # The rules are sorted in reverse order, so the greatest rule is used
+        # for duplicate commands.
+        if (aCommand not in self.commands or
+            self.commands[aCommand][0] < aRule):
+            self.commands[aCommand] = (aRule, aCodePoint, aToken)
+
+    def write(self, aOutput):
+        # Write the index of commands and characters as JSON. The characters
+        # are identified as in unicode.xml e.g. "U0003D-02237".
+        commands = dict()
+        characters = dict()
+        for command in self.commands:
+            (rule, codePoint, token) = self.commands[command]
+            commands[command] = {"codePoints": codePoint, "class": token}
+            key = "-".join("%05X" % value for value in codePoint)
+            characters.setdefault("U" + key, []).append(command)
+        for key in characters:
+            characters[key].sort()
+        json.dump({"commands": commands, "characters": characters}, aOutput,
+                  sort_keys = True, separators = (",", ":"))
+        print("", file = aOutput)
+
+def parseUnicodeRange(aValue):
+    # Parse a range of code points "0370-03FF" or a single code point "2202",
+    # in hexadecimal and optionally prefixed with "U+".
+    bounds = aValue.upper().replace("U+", "").split("-")
+    try:
+        if len(bounds) == 1:
+            bounds = bounds * 2
+        elif len(bounds) != 2:
+            raise ValueError
+        (start, end) = [int(bound, 16) for bound in bounds]
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid Unicode range: %s" % aValue)
+    if start > end or end > 0x10FFFF:
+        raise argparse.ArgumentTypeError("invalid Unicode range: %s" % aValue)
+    return (start, end)
+
+def readCommandList(aFile):
+    # Read a list of LaTeX commands, one per line.
+    commands = set()
+    for line in aFile:
+        line = line.strip()
+        if line != "" and not line.startswith("#"):
+            commands.add(line)
+    return commands
+
+class CharacterFilter:
+
+    def __init__(self, aMathclasses, aRanges, aCommands):
+        # The characters are kept if their token starts with one of the
+        # mathclasses and if all their code points are in one of the ranges.
+        # The LaTeX commands are kept if they are in the set of commands.
+        # None means that there is no restriction.
+        self.mathclasses = aMathclasses
+        self.ranges = aRanges
+        self.commands = aCommands
+
+    def acceptCharacter(self, aCodePoint, aToken):
+        if (self.mathclasses is not None and
+            not any(aToken.startswith(mathclass)
+                    for mathclass in self.mathclasses)):
+            return False
+        if self.ranges is not None:
+            for value in aCodePoint:
+                if not any(start <= value and value <= end
+                           for (start, end) in self.ranges):
+                    return False
+        return True
+
+    def acceptCommand(self, aCommand):
+        # Commands like ' or - that do not start with a backslash are just
+        # the syntax of the character and are always kept.
+        return (self.commands is None or not aCommand.startswith("\\") or
+                aCommand in self.commands)
+
+# Characters without mathclass that we extract from unicode.xml.
+EXTRA_CHARACTER_IDS = set(["U00024", "U000F0", "U003C2",
+                           "U0228A-0FE00", "U02268-0FE00", "U02269-0FE00",
+                           "U0228B-0FE00", "U02ACB-0FE00", "U02ACC-0FE00"])
+
+# Some of the char combinations from itex2MML are not in unicode.xml, so we
+# add them here.
+EXTRA_CHARACTERS = [
+    ["U0003D-02237", "OP", "\\Eqcolon"],
+    ["U02237-02212", "OP", "\\Coloneq"],
+    ["U0003D-02237", "OP", "\\Eqqcolon"],
+    ["U02212-02237", "OP", "\\Eqcolon"],
+    ["U02236-02248", "OP", "\\colonapprox"],
+    ["U02237-02248", "OP", "\\Colonapprox"],
+    ["U02236-0223C", "OP", "\\colonsim"],
+    ["U02237-0223C", "OP", "\\Colonsim"]
+]
+
+def getCharacterInfo(aCharacter):
+    # Return the id, mathclass and LaTeX commands of a character element of
+    # unicode.xml or None if the character is not relevant. For the LaTeX
+    # commands, we use the 'AMS' set as a reference modulo some modifications
+    # to match itex2MML's coverage. See isLaTeXCharacterCommand and
+    # addLaTeXCommands.
+    AMS = aCharacter.find("AMS")
+    if AMS is None:
+        LaTeXCommands = []
+    else:
+        LaTeXCommands = "".join(AMS.itertext()).split()
+
+    # First handle the characters from the MathML operator dictionary.
+    operators = aCharacter.findall("operator-dictionary")
+    if len(operators) > 0:
+        mathclass = "OP"
+        for (attribute, flag) in [("fence", "F"),
+                                  ("movablelimits", "M"),
+                                  ("stretchy", "S")]:
+            for operator in operators:
+                if operator.get(attribute) is not None:
+                    mathclass += flag
+                    break
+        return [aCharacter.get("id"), mathclass] + LaTeXCommands
+
+    # Then handle the characters that have a mathclass as well as a few extra
+    # characters.
+    unicodedata = aCharacter.find("unicodedata")
+    if unicodedata is not None and unicodedata.get("mathclass") is not None:
+        mathclass = unicodedata.get("mathclass")
+    elif aCharacter.get("id") in EXTRA_CHARACTER_IDS:
+        mathclass = "?"
+    else:
+        return None
+    return [aCharacter.get("id"), mathclass] + LaTeXCommands
+
+def readUnicodeXML(aFile):
+    # Parse unicode.xml incrementally and yield the id, mathclass and LaTeX
+    # commands of each relevant character.
+    # The characters are read at any depth, since they are in
+    # <unicode><charlist> in the W3C file. The processed characters and the
+    # other children of the root are removed from the tree to keep the memory
+    # usage bounded.
+    ancestors = []
+    for (event, element) in ElementTree.iterparse(aFile,
+                                                  events = ("start", "end")):
+        if event == "start":
+            ancestors.append(element)
+            continue
+        ancestors.pop()
+        info = None
+        if element.tag == "character":
+            info = getCharacterInfo(element)
+        if ancestors and (element.tag == "character" or len(ancestors) == 1):
+            ancestors[-1].remove(element)
+        if info is not None:
+            yield info
+
+    for info in EXTRA_CHARACTERS:
+        yield list(info)
+
+def readCharacters(aFile):
+    # Read the characters from unicode.xml or from a text file with one
+    # character per line, in the format "U0003D-02237 OP \Eqcolon".
+    if aFile.name.endswith(".xml"):
+        return readUnicodeXML(aFile)
+    return (line.split() for line in aFile if line.strip() != "")
+
+# Regular expressions to read the Jison rules of commands.
+QUOTED_STRING = re.compile(r'"((?:[^"\\]|\\.)*)"')
+COMMAND_RULE = re.compile(r'^((?:"(?:[^"\\]|\\.)*"\s*\|\s*)*"(?:[^"\\]|\\.)*")'
+                          r'\s+(.*?)\s*$')
+LETTER_COMMAND = re.compile(r'^\\\\([a-zA-Z]+)$')
+SIMPLE_ACTION = re.compile(r'^return\s+"([A-Z0-9_]+)";$')
+TEXT_ACTION = re.compile(r'^\{\s*yytext\s*=\s*"((?:[^"\\]|\\.)*)";\s*'
+                         r'return\s+"([A-Z0-9_]+)";\s*\}$')
+
+# Javascript code appended to the lexer when the commands are looked up in a
+# table. lexCommand is the action of the rule matching "\\"[a-zA-Z]+ and
+# selects the longest command that is a prefix of the matched text, as the
+# reverse-sorted list of literal rules would do.
+COMMAND_TABLE_CODE = """
+function keepMatch(aLexer, aLength) {
+  /* Same as aLexer.less(aLength) but keep match and matched consistent. */
+  var match = aLexer.match, matched = aLexer.matched;
+  aLexer.unput(match.slice(aLength));
+  aLexer.match = match.slice(0, aLength);
+  aLexer.matched = matched.slice(0, matched.length - match.length + aLength);
+}
+
+function lexCommand(aLexer) {
+  var name = aLexer.yytext.slice(1), command;
+  while (name && !commandTable.hasOwnProperty(name)) {
+    name = name.slice(0, -1);
+  }
+  if (name.length + 1 < aLexer.yytext.length) {
+    keepMatch(aLexer, name.length + 1);
+  }
+  if (!name) {
+    /* Not a command, treat the backslash as a normal character. */
+    return "BMP_CHARACTER";
+  }
+  command = commandTable[name];
+  if (typeof command === "number") {
+    return performCommandAction(aLexer, command);
+  }
+  if (command.length > 1) {
+    aLexer.yytext = command[1];
+  }
+  return command[0];
+}
+"""
+
+def getSortKey(aRule):
+    # Same order as sort --reverse --field-separator='"' --key=2,2 in the
+    # C locale, when used with reverse=True.
+    fields = aRule.split("\"")
+    return (fields[1] if len(fields) > 1 else "", aRule)
+
+def splitCommandRule(aRule):
+    # Return the list of quoted keys and the action of a rule.
+    match = COMMAND_RULE.match(aRule)
+    if match is None:
+        return None
+    return (QUOTED_STRING.findall(match.group(1)), match.group(2))
+
+def getLexerAction(aAction):
+    # Rewrite a rule action as the body of a function taking the lexer as
+    # the aLexer parameter.
+    aAction = re.sub(r"\bthis\b", "aLexer", aAction)
+    return re.sub(r"\byytext\b", "aLexer.yytext", aAction)
+
+def getCommandTableEntry(aAction, aActions):
+    # Return the table value for a command: [token] or [token, text] for the
+    # usual actions and otherwise the index of the action in aActions.
+    match = SIMPLE_ACTION.match(aAction)
+    if match is not None:
+        return "[\"%s\"]" % match.group(1)
+    match = TEXT_ACTION.match(aAction)
+    if match is not None:
+        return "[\"%s\", \"%s\"]" % (match.group(2), match.group(1))
+    if aAction not in aActions:
+        aActions.append(aAction)
+    return str(aActions.index(aAction))
+
+def writeCommandTable(aRules, aOutput, aTableOutput):
+    # Write the rules of the commands that are not made of letters, sorted as
+    # the Makefile does, followed by a single rule for the other commands.
+    # Their tokens are saved in a table written to aTableOutput, which must
+    # be appended to the lexer as module code.
+    literalRules = []
+    table = []
+    names = set()
+    actions = []
+    for rule in sorted(aRules, key = getSortKey, reverse = True):
+        command = splitCommandRule(rule)
+        if command is None:
+            literalRules.append(rule)
+            continue
+        keys, action = command
+        otherKeys = []
+        for key in keys:
+            match = LETTER_COMMAND.match(key)
+            if match is None:
+                otherKeys.append(key)
+            elif match.group(1) not in names:
+                # Only the first rule is used for duplicate commands.
+                names.add(match.group(1))
+                table.append((match.group(1),
+                              getCommandTableEntry(action, actions)))
+        if len(otherKeys) > 0:
+            literalRules.append("%s %s" % ("|".join("\"%s\"" % key
+                                                    for key in otherKeys),
+                                           action))
+
+    for rule in literalRules:
+        print(rule, file = aOutput)
+    print("\"\\\\\"[a-zA-Z]+ return lexCommand(this);", file = aOutput)
+
+    print("/* Generated by generateCharCommands.py */", file = aTableOutput)
+    print("var commandTable = {", file = aTableOutput)
+    print(",\n".join("\"%s\": %s" % entry for entry in table),
+          file = aTableOutput)
+    print("};", file = aTableOutput)
+    print("\nfunction performCommandAction(aLexer, aIndex) {",
+          file = aTableOutput)
+    print("  switch (aIndex) {", file = aTableOutput)
+    for i in range(0, len(actions)):
+        action = getLexerAction(actions[i])
+        if not action.startswith("{"):
+            action = "{ %s }" % action
+        print("    case %d: %s" % (i, action), file = aTableOutput)
+    print("  }\n}", file = aTableOutput)
+    print(COMMAND_TABLE_CODE, file = aTableOutput, end = "")
+
+# Javascript code appended to the lexer when the characters are classified
+# with a table. lexCharacter is the action of the rule matching any character
+# and does a binary search in the sorted list of code point ranges.
+CLASS_TABLE_CODE = """
+function lexCharacter(aLexer) {
+  var text = aLexer.yytext, codePoint = text.charCodeAt(0);
+  var low = 0, high = characterClassTable.length / 3 - 1, middle;
+  if (text.length > 1) {
+    codePoint = 0x10000 + ((codePoint - 0xD800) << 10) +
+      (text.charCodeAt(1) - 0xDC00);
+  }
+  while (low <= high) {
+    middle = (low + high) >> 1;
+    if (codePoint < characterClassTable[3 * middle]) {
+      high = middle - 1;
+    } else if (codePoint > characterClassTable[3 * middle + 1]) {
+      low = middle + 1;
+    } else {
+      return characterClassTokens[characterClassTable[3 * middle + 2]];
+    }
+  }
+  /* Not in the table, use the same tokens as the fallback rules. */
+  if (text.length > 1) {
+    aLexer.less(1);
+    return "HIGH_SURROGATE";
+  }
+  if (0xD800 <= codePoint && codePoint <= 0xDBFF) {
+    return "HIGH_SURROGATE";
+  }
+  if (0xDC00 <= codePoint && codePoint <= 0xDFFF) {
+    return "LOW_SURROGATE";
+  }
+  return "BMP_CHARACTER";
+}
+"""
+
+def writeClassTable(aTokens, aOutput, aTableOutput):
+    # Write a single rule for all the characters, whose tokens are saved in a
+    # table of code point ranges written to aTableOutput. That file must be
+    # appended to the lexer as module code.
+    tokens = sorted(set(aTokens.values()))
+    ranges = []
+    for codePoint in sorted(aTokens):
+        token = tokens.index(aTokens[codePoint])
+        if (len(ranges) > 0 and ranges[-1][1] + 1 == codePoint and
+            ranges[-1][2] == token):
+            ranges[-1][1] = codePoint
+        else:
+            ranges.append([codePoint, codePoint, token])
+
+    # This rule has no quoted key, so the Makefile will sort it last.
+    print("[\\uD800-\\uDBFF][\\uDC00-\\uDFFF]|. return lexCharacter(this);",
+          file = aOutput)
+
+    print("/* Generated by generateCharCommands.py */", file = aTableOutput)
+    print("var characterClassTokens = [%s];" %
+          ", ".join("\"%s\"" % token for token in tokens),
+          file = aTableOutput)
+    print("var characterClassTable = [", file = aTableOutput)
+    print(",\n".join("0x%X, 0x%X, %d" % tuple(r) for r in ranges),
+          file = aTableOutput)
+    print("];", file = aTableOutput)
+    print(CLASS_TABLE_CODE, file = aTableOutput, end = "")
+
+def readCommandRules(aFile):
+    # Read the Jison rules of a file like base-commands.txt.
+    rules = []
+    for line in aFile:
+        line = line.strip()
+        if line != "" and not line.startswith("#"):
+            rules.append(line)
+    return rules
+
+def getFingerprint(aPaths, aOptions):
+    # Hash the content of the input files and the generation options.
+    fingerprint = hashlib.sha1()
+    for path in aPaths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(65536), b""):
+                fingerprint.update(chunk)
+        fingerprint.update(b"\0")
+    fingerprint.update(aOptions.encode("utf-8"))
+    return fingerprint.hexdigest()
+
+def isUpToDate(aFingerprintPath, aFingerprint, aOutputs):
+    # The outputs are up to date if they exist and were generated from inputs
+    # with the same fingerprint.
+    if not os.path.exists(aFingerprintPath):
+        return False
+    with open(aFingerprintPath) as f:
+        if f.read().strip() != aFingerprint:
+            return False
+    for path in aOutputs:
+        if not os.path.exists(path):
+            return False
+    return True
+
+def openOutput(aPath):
+    # Open a temporary file for aPath, see closeOutput.
+    if aPath == "-":
+        return sys.stdout
+    return open(aPath + ".tmp", "w")
+
+def closeOutput(aFile, aPath):
+    # Replace aPath with the temporary file only if the content changed, so
+    # that its modification time is kept and that make does not regenerate
+    # the files depending on it.
+    if aFile is sys.stdout:
+        return
+    aFile.close()
+    if os.path.exists(aPath):
+        if filecmp.cmp(aFile.name, aPath, shallow = False):
+            os.remove(aFile.name)
+            return
+        os.remove(aPath)
+    os.rename(aFile.name, aPath)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser();
     parser.add_argument("input", nargs = "?", type=argparse.FileType('r'),
-                        default = sys.stdin)
-    parser.add_argument("output", nargs = "?", type=argparse.FileType('w'),
-                        default = sys.stdout)
+                        default = sys.stdin,
+                        help = "unicode.xml or a text file with one "
+                               "character per line")
+    parser.add_argument("output", nargs = "?", default = "-")
+    parser.add_argument("--base-commands", type=argparse.FileType('r'),
+                        help = "merge the rules of base-commands.txt with "
+                               "the character commands")
+    parser.add_argument("--command-table",
+                        help = "look up the commands made of letters in a "
+                               "table written to this file, which must be "
+                               "appended to the lexer as module code "
+                               "(requires --base-commands)")
+    parser.add_argument("--class-table",
+                        help = "classify the characters with a table of code "
+                               "point ranges written to this file, which must "
+                               "be appended to the lexer as module code")
+    parser.add_argument("--symbol-index",
+                        help = "write a JSON index of the commands and "
+                               "characters to this file")
+    parser.add_argument("--fingerprint",
+                        help = "save a hash of the inputs in this file and do "
+                               "nothing if they did not change since the "
+                               "last generation")
+    parser.add_argument("--mathclass", action = "append",
+                        help = "only keep the characters whose class starts "
+                               "with one of these comma-separated values "
+                               "e.g. A,OP,NUM (can be repeated)")
+    parser.add_argument("--unicode-range", action = "append",
+                        type = parseUnicodeRange,
+                        help = "only keep the characters in this range of "
+                               "hexadecimal code points e.g. 0370-03FF (can "
+                               "be repeated)")
+    parser.add_argument("--commands", type=argparse.FileType('r'),
+                        help = "only keep the LaTeX commands of characters "
+                               "listed in this file, one per line")
     args = parser.parse_args();
+    if args.command_table is not None and args.base_commands is None:
+        parser.error("--command-table requires --base-commands")
+    if args.mathclass is not None:
+        args.mathclass = sorted(set(mathclass
+                                    for value in args.mathclass
+                                    for mathclass in value.split(",")
+                                    if mathclass != ""))
+    if args.unicode_range is not None:
+        args.unicode_range = sorted(set(args.unicode_range))
+
+    outputs = [path for path in [args.output,
+                                 args.command_table,
+                                 args.class_table,
+                                 args.symbol_index] if path is not None]
+    if args.fingerprint is not None:
+        if args.input is sys.stdin or "-" in outputs:
+            parser.error("--fingerprint requires input and output files")
+        inputs = [os.path.abspath(__file__), args.input.name]
+        if args.base_commands is not None:
+            inputs.append(args.base_commands.name)
+        if args.commands is not None:
+            inputs.append(args.commands.name)
+        fingerprint = getFingerprint(inputs,
+                                     "command-table=%s class-table=%s "
+                                     "symbol-index=%s mathclass=%s "
+                                     "unicode-range=%s commands=%s" %
+                                     (args.command_table is not None,
+                                      args.class_table is not None,
+                                      args.symbol_index is not None,
+                                      args.mathclass, args.unicode_range,
+                                      args.commands is not None))
+        if isUpToDate(args.fingerprint, fingerprint, outputs):
+            sys.exit(0)
+
+    output = openOutput(args.output)
 
     tokenRegExp = dict()
+    characterTokens = dict()
+    symbolIndex = SymbolIndex()
+    rules = []
 
-    for line in args.input:
-        info = line.split()
+    commands = None
+    if args.commands is not None:
+        commands = readCommandList(args.commands)
+        args.commands.close()
+    characterFilter = CharacterFilter(args.mathclass, args.unicode_range,
+                                      commands)
+
+    for info in readCharacters(args.input):
 
         # Extract the Unicode code point of the character and compute the
         # corresponding Javascript string.
@@ -473,14 +822,15 @@ if __name__ == "__main__":
 
         # Extract the TeX commands for this character and add more definitions.
         LaTeXCommands = []
-        for command in set(info[2:]): # use "set" to remove duplicate entries.
+        for command in sorted(set(info[2:])): # remove duplicate entries.
             if (isLaTeXCharacterCommand(command)):
                 LaTeXCommands.append(command)
         addLaTeXCommands(codePoint, LaTeXCommands)
 
         # Escape the backslahes.
-        for i in range(0,len(LaTeXCommands)):
-            LaTeXCommands[i] = LaTeXCommands[i].replace("\\", "\\\\")
+        escapedCommands = []
+        for command in LaTeXCommands:
+            escapedCommands.append(command.replace("\\", "\\\\"))
 
         if (mathclass[:1] == "A" or mathclass[:2] == "OP" or
             mathclass == "NUM" or mathclass == "TEXT"):
@@ -488,11 +838,21 @@ if __name__ == "__main__":
         else:
             token = None
 
+        if token is not None and not characterFilter.acceptCharacter(codePoint,
+                                                                     token):
+            # The character is not part of the subset. It is treated as an
+            # ordinary character and its commands are unknown.
+            token = None
+
         if token is not None:
             # Create rule for each LaTeX command.
-            for command in LaTeXCommands:
-                print("\"%s\" { yytext = \"%s\"; return \"%s\"; }" %
-                      (command, jsString, token), file = args.output)
+            for i in range(0, len(LaTeXCommands)):
+                if not characterFilter.acceptCommand(LaTeXCommands[i]):
+                    continue
+                rule = ("\"%s\" { yytext = \"%s\"; return \"%s\"; }" %
+                        (escapedCommands[i], jsString, token))
+                rules.append(rule)
+                symbolIndex.add(LaTeXCommands[i], codePoint, token, rule)
 
             if len(codePoint) == 1:
 
@@ -506,15 +866,44 @@ if __name__ == "__main__":
                 if token not in tokenRegExp:
                     tokenRegExp[token] = UnicodeRange()
                 tokenRegExp[token].add(codePoint[0])
-            else:
-                # Otherwise, print a rule now.
-                print("\"%s\" return \"%s\";" % (jsString, token),
-                      file = args.output)
 
-    # Now print a Unicode range rule for each token.
-    for token in tokenRegExp:
-        print("%s return \"%s\";" % (str(tokenRegExp[token]), token),
-              file = args.output)
+                # The rules are sorted in reverse order of their tokens, so
+                # the greatest token is used for duplicate characters.
+                if (codePoint[0] not in characterTokens or
+                    characterTokens[codePoint[0]] < token):
+                    characterTokens[codePoint[0]] = token
+            else:
+                # Otherwise, add a rule now.
+                rules.append("\"%s\" return \"%s\";" % (jsString, token))
+
+    if args.command_table is None:
+        for rule in rules:
+            print(rule, file = output)
+    else:
+        rules.extend(readCommandRules(args.base_commands))
+        tableOutput = openOutput(args.command_table)
+        writeCommandTable(rules, output, tableOutput)
+        closeOutput(tableOutput, args.command_table)
+        args.base_commands.close()
+
+    if args.class_table is None:
+        # Now print a Unicode range rule for each token.
+        for token in sorted(tokenRegExp):
+            print("%s return \"%s\";" % (str(tokenRegExp[token]), token),
+                  file = output)
+    else:
+        tableOutput = openOutput(args.class_table)
+        writeClassTable(characterTokens, output, tableOutput)
+        closeOutput(tableOutput, args.class_table)
+
+    if args.symbol_index is not None:
+        indexOutput = openOutput(args.symbol_index)
+        symbolIndex.write(indexOutput)
+        closeOutput(indexOutput, args.symbol_index)
 
     args.input.close()
-    args.output.close()
+    closeOutput(output, args.output)
+
+    if args.fingerprint is not None:
+        with open(args.fingerprint, "w") as f:
+            print(fingerprint, file = f)
@@ -0,0 +1,469 @@
+/* This Source Code Form is subject to the terms of the Mozilla Public
+ * License, v. 2.0. If a copy of the MPL was not distributed with this
+ * file, You can obtain one at http://mozilla.org/MPL/2.0/. */
+
+/* Load test of the TeXZilla Web server, to be run with nodejs:
+
+     nodejs loadtest.js [--corpus FILE] [--rate N] [--concurrency N]
+                        [--duration SECONDS] [--method GET|POST|mixed]
+                        [--timeout MS] [--interval MS] [--server commonjs|python]
+                        [--python PYTHON] [--output FILE]
+
+   The server ("nodejs TeXZilla.js webserver" or examples/TeXZillaServer.py)
+   is started on a free local port and the formulas of --corpus are sent in a
+   loop for --duration seconds (default: 30). The corpus is a file with one
+   formula per line, or one JSON string or {"tex": ...} object per line. By
+   default, the corpora of benchmark.js are used, so that big inputs are mixed
+   with small ones.
+
+   The requests are scheduled at --rate requests per second (default: 0,
+   that is as fast as possible) with at most --concurrency requests in flight
+   (default: 8). A scheduled request waits for a free slot and its latency is
+   measured from the time at which it was scheduled, so that a stalled server
+   is not hidden by a slower client. --method selects GET requests, POST
+   requests or alternates between them (default: mixed).
+
+   The throughput, the latency percentiles and the error rates are printed
+   for the whole run and, with the resident memory of the server and of its
+   child processes, for each --interval (default: 1000 ms). The results are written as JSON to --output
+   (default: loadtest-results.json). */
+
+var fs = require("fs"), path = require("path"), http = require("http"),
+    net = require("net"), childProcess = require("child_process"),
+    benchmark = require("./benchmark");
+
+var getTime = benchmark.getTime, getPercentile = benchmark.getPercentile;
+
+/* The connections are reused between requests, like those of a reverse
+   proxy. */
+var agent = new http.Agent({ keepAlive: true });
+
+function parseArguments(aArgs) {
+  var options = {
+    corpus: null,
+    rate: 0,
+    concurrency: 8,
+    duration: 30,
+    method: "mixed",
+    timeout: 10000,
+    interval: 1000,
+    server: "commonjs",
+    python: "python",
+    output: "loadtest-results.json"
+  }, i, name;
+  var names = {
+    "--corpus": "corpus", "--rate": "rate", "--concurrency": "concurrency",
+    "--duration": "duration", "--method": "method", "--timeout": "timeout",
+    "--interval": "interval", "--server": "server", "--python": "python",
+    "--output": "output"
+  };
+  for (i = 0; i < aArgs.length; i += 2) {
+    name = names[aArgs[i]];
+    if (!name || i + 1 >= aArgs.length) {
+      throw new Error("Invalid argument: " + aArgs[i]);
+    }
+    options[name] = aArgs[i + 1];
+  }
+  options.rate = parseFloat(options.rate);
+  options.concurrency = parseInt(options.concurrency, 10);
+  options.duration = parseFloat(options.duration);
+  options.timeout = parseInt(options.timeout, 10);
+  options.interval = parseInt(options.interval, 10);
+  if (["GET", "POST", "mixed"].indexOf(options.method) < 0) {
+    throw new Error("Invalid method: " + options.method);
+  }
+  if (["commonjs", "python"].indexOf(options.server) < 0) {
+    throw new Error("Invalid server: " + options.server);
+  }
+  return options;
+}
+
+////////////////////////////////////////////////////////////////////////////////
+// Corpus
+////////////////////////////////////////////////////////////////////////////////
+
+function readCorpus(aPath) {
+  /* Read one formula per line. JSON strings and objects are decoded. */
+  return fs.readFileSync(aPath, "utf8").split("\n").filter(function(aLine) {
+    return aLine.trim() !== "";
+  }).map(function(aLine) {
+    var json;
+    if (!/^\s*[{"]/.test(aLine)) {
+      return aLine;
+    }
+    json = JSON.parse(aLine);
+    return typeof json === "string" ? json : json.tex;
+  });
+}
+
+function getDefaultCorpus() {
+  /* The corpora of benchmark.js, interleaved so that the big inputs are
+     spread over the run. */
+  var corpora = benchmark.getCorpora(1), formulas = [], lists = [], name, i,
+      done;
+  for (name in corpora) {
+    lists.push(corpora[name]);
+  }
+  for (i = 0, done = false; !done; i++) {
+    done = true;
+    lists.forEach(function(aList) {
+      if (i < aList.length) {
+        formulas.push(aList[i]);
+        done = false;
+      }
+    });
+  }
+  return formulas;
+}
+
+////////////////////////////////////////////////////////////////////////////////
+// Server
+////////////////////////////////////////////////////////////////////////////////
+
+function getFreePort(aCallback) {
+  var server = net.createServer();
+  server.listen(0, "127.0.0.1", function() {
+    var port = server.address().port;
+    server.close(function() {
+      aCallback(port);
+    });
+  });
+}
+
+function startServer(aOptions, aPort) {
+  var command, args;
+  if (aOptions.server === "python") {
+    command = aOptions.python;
+    args = [path.join(__dirname, "examples", "TeXZillaServer.py"),
+            "--host", "127.0.0.1", "--port", String(aPort),
+            "--texzilla", path.join(__dirname, "TeXZilla.js")];
+  } else {
+    command = process.execPath;
+    args = [path.join(__dirname, "TeXZilla.js"), "webserver", String(aPort)];
+  }
+  return childProcess.spawn(command, args, { stdio: ["ignore", "ignore",
+                                                     "inherit"] });
+}
+
+function getProcesses() {
+  /* Return the [pid, parent pid, resident memory in bytes] of the running
+     processes, or null if they are not available on this platform. */
+  var processes = [];
+  try {
+    fs.readdirSync("/proc").forEach(function(aName) {
+      var status, ppid, rss;
+      if (!/^\d+$/.test(aName)) {
+        return;
+      }
+      try {
+        status = fs.readFileSync("/proc/" + aName + "/status", "utf8");
+      } catch (e) {
+        /* The process exited. */
+        return;
+      }
+      ppid = /^PPid:\s+(\d+)/m.exec(status);
+      rss = /^VmRSS:\s+(\d+) kB/m.exec(status);
+      if (ppid) {
+        processes.push([parseInt(aName, 10), parseInt(ppid[1], 10),
+                        rss ? parseInt(rss[1], 10) * 1024 : 0]);
+      }
+    });
+    return processes;
+  } catch (e) {
+  }
+  try {
+    childProcess.execFileSync("ps", ["-A", "-o", "pid=,ppid=,rss="]).
+      toString().split("\n").forEach(function(aLine) {
+        var fields = aLine.trim().split(/\s+/).map(Number);
+        if (fields.length === 3) {
+          processes.push([fields[0], fields[1], fields[2] * 1024]);
+        }
+      });
+    return processes;
+  } catch (e) {
+    return null;
+  }
+}
+
+function getResidentMemory(aPid) {
+  /* Return the resident memory in bytes of a process and of all its
+     descendants, e.g. the forkserver and the workers of the Python server,
+     or null if it is not available on this platform. The pages shared by
+     several processes are counted for each of them. */
+  var processes = getProcesses(), pids = [aPid], total = null, i;
+  if (!processes) {
+    return null;
+  }
+  for (i = 0; i < pids.length; i++) {
+    processes.forEach(function(aProcess) {
+      if (aProcess[0] === pids[i]) {
+        total += aProcess[2];
+      } else if (aProcess[1] === pids[i]) {
+        pids.push(aProcess[0]);
+      }
+    });
+  }
+  return total;
+}
+
+////////////////////////////////////////////////////////////////////////////////
+// Requests
+////////////////////////////////////////////////////////////////////////////////
+
+function sendRequest(aPort, aMethod, aTeX, aTimeout, aCallback) {
+  /* Send one conversion request and call aCallback(aError, aResult) where
+     aResult is the {tex, mathml, exception} object returned by the server. */
+  var options = { host: "127.0.0.1", port: aPort, method: aMethod,
+                  path: "/", agent: agent }, body = null, request, done = false;
+  var finish = function(aError, aResult) {
+    if (!done) {
+      done = true;
+      aCallback(aError, aResult);
+    }
+  };
+  if (aMethod === "GET") {
+    options.path = "/?tex=" + encodeURIComponent(aTeX);
+  } else {
+    body = JSON.stringify({ tex: aTeX });
+    options.headers = { "Content-Type": "application/json",
+                        "Content-Length": Buffer.byteLength(body) };
+  }
+  request = http.request(options, function(aResponse) {
+    var data = "";
+    aResponse.setEncoding("utf8");
+    aResponse.on("data", function(aChunk) {
+      data += aChunk;
+    });
+    aResponse.on("end", function() {
+      var result;
+      if (aResponse.statusCode !== 200) {
+        finish(new Error("HTTP " + aResponse.statusCode));
+        return;
+      }
+      try {
+        /* The server encodes the JSON response twice. */
+        result = JSON.parse(JSON.parse(data));
+      } catch (e) {
+        finish(new Error("Invalid response"));
+        return;
+      }
+      finish(null, result);
+    });
+  });
+  request.setTimeout(aTimeout, function() {
+    request.abort();
+    finish(new Error("Timeout"));
+  });
+  request.on("error", function(aError) {
+    finish(aError);
+  });
+  if (body !== null) {
+    request.write(body);
+  }
+  request.end();
+}
+
+function waitForServer(aPort, aDeadline, aCallback) {
+  sendRequest(aPort, "GET", "x", 1000, function(aError) {
+    if (!aError) {
+      aCallback(null);
+    } else if (Date.now() > aDeadline) {
+      aCallback(new Error("The server did not start"));
+    } else {
+      setTimeout(function() {
+        waitForServer(aPort, aDeadline, aCallback);
+      }, 100);
+    }
+  });
+}
+
+////////////////////////////////////////////////////////////////////////////////
+// Measurements
+////////////////////////////////////////////////////////////////////////////////
+
+function newSample() {
+  return { latencies: [], errors: 0, conversionErrors: 0, errorTypes: {} };
+}
+
+function addToSample(aSample, aLatency, aError, aResult) {
+  aSample.latencies.push(aLatency);
+  if (aError) {
+    aSample.errors++;
+    aSample.errorTypes[aError.message] =
+      (aSample.errorTypes[aError.message] || 0) + 1;
+  } else if (aResult.exception) {
+    aSample.conversionErrors++;
+  }
+}
+
+function summarizeSample(aSample, aSeconds) {
+  var latencies = aSample.latencies.slice().sort(function(a, b) {
+    return a - b;
+  }), count = latencies.length;
+  return {
+    "requests": count,
+    "requestsPerSecond": count / aSeconds,
+    "p50Ms": count ? getPercentile(latencies, 50) : null,
+    "p90Ms": count ? getPercentile(latencies, 90) : null,
+    "p99Ms": count ? getPercentile(latencies, 99) : null,
+    "maxMs": count ? latencies[count - 1] : null,
+    "errorRate": count ? aSample.errors / count : 0,
+    "conversionErrorRate": count ? aSample.conversionErrors / count : 0,
+    "errors": aSample.errorTypes
+  };
+}
+
+function formatSummary(aSummary) {
+  var format = function(aValue) {
+    return aValue === null ? "-" : aValue.toFixed(1);
+  };
+  return aSummary.requests + " requests, " +
+    aSummary.requestsPerSecond.toFixed(1) + " req/s, p50 " +
+    format(aSummary.p50Ms) + " ms, p99 " + format(aSummary.p99Ms) +
+    " ms, max " + format(aSummary.maxMs) + " ms, errors " +
+    (aSummary.errorRate * 100).toFixed(2) + "%";
+}
+
+function runLoad(aOptions, aFormulas, aPort, aServerPid, aCallback) {
+  /* Replay the formulas and call aCallback with the results. */
+  var total = newSample(), sample = newSample(), timeline = [], queue = [],
+      inFlight = 0, next = 0, sent = 0, start = getTime(), sampleStart = start,
+      end = start + aOptions.duration * 1e3, scheduling = true, scheduler,
+      sampler, peakRSS = 0, peakQueue = 0;
+
+  var dispatch = function() {
+    var scheduled, tex, method;
+    while (queue.length > 0 && inFlight < aOptions.concurrency) {
+      scheduled = queue.shift();
+      tex = aFormulas[next];
+      next = (next + 1) % aFormulas.length;
+      method = aOptions.method === "mixed" ?
+        (sent % 2 ? "POST" : "GET") : aOptions.method;
+      sent++;
+      inFlight++;
+      (function(aScheduled) {
+        sendRequest(aPort, method, tex, aOptions.timeout,
+                    function(aError, aResult) {
+                      var latency = getTime() - aScheduled;
+                      inFlight--;
+                      addToSample(total, latency, aError, aResult);
+                      addToSample(sample, latency, aError, aResult);
+                      if (scheduling) {
+                        if (aOptions.rate <= 0) {
+                          queue.push(getTime());
+                        }
+                        dispatch();
+                      } else if (inFlight === 0) {
+                        finish();
+                      }
+                    });
+      })(scheduled);
+    }
+    peakQueue = Math.max(peakQueue, queue.length);
+  };
+
+  var takeSample = function() {
+    var now = getTime(), rss = getResidentMemory(aServerPid), summary;
+    summary = summarizeSample(sample, (now - sampleStart) / 1e3);
+    summary["timeSeconds"] = (now - start) / 1e3;
+    summary["serverRSSBytes"] = rss;
+    summary["inFlight"] = inFlight;
+    summary["queued"] = queue.length;
+    if (rss !== null) {
+      peakRSS = Math.max(peakRSS, rss);
+    }
+    timeline.push(summary);
+    console.log("[" + summary["timeSeconds"].toFixed(1) + " s] " +
+                formatSummary(summary) + ", queued " + queue.length +
+                (rss === null ? "" :
+                 ", server RSS " + (rss / 1048576).toFixed(1) + " MiB"));
+    sample = newSample();
+    sampleStart = now;
+  };
+
+  var finish = function() {
+    var results;
+    clearInterval(sampler);
+    takeSample();
+    results = summarizeSample(total, (getTime() - start) / 1e3);
+    results["timeline"] = timeline;
+    results["peakServerRSSBytes"] = peakRSS || null;
+    results["peakQueued"] = peakQueue;
+    results["unsentRequests"] = queue.length;
+    aCallback(results);
+  };
+
+  if (aOptions.rate > 0) {
+    /* Open loop: schedule the requests at a fixed rate, whatever the
+       response times are. */
+    scheduler = setInterval(function() {
+      var now = getTime(), count = Math.floor((now - start) / 1e3 *
+                                              aOptions.rate) - sent -
+          queue.length;
+      while (count-- > 0) {
+        queue.push(now);
+      }
+      dispatch();
+    }, Math.max(1, Math.min(10, 1e3 / aOptions.rate)));
+  } else {
+    /* Closed loop: keep the concurrency slots busy. */
+    while (queue.length < aOptions.concurrency) {
+      queue.push(start);
+    }
+    dispatch();
+  }
+  sampler = setInterval(takeSample, aOptions.interval);
+  setTimeout(function() {
+    scheduling = false;
+    clearInterval(scheduler);
+    if (inFlight === 0) {
+      finish();
+    }
+  }, aOptions.duration * 1e3);
+}
+
+function main(aArgs) {
+  var options = parseArguments(aArgs), formulas;
+  formulas = options.corpus ? readCorpus(options.corpus) : getDefaultCorpus();
+  if (formulas.length === 0) {
+    throw new Error("The corpus is empty");
+  }
+  getFreePort(function(aPort) {
+    var server = startServer(options, aPort), exited = false;
+    server.on("exit", function(aCode) {
+      exited = true;
+    });
+    waitForServer(aPort, Date.now() + 30000, function(aError) {
+      if (aError) {
+        server.kill();
+        throw aError;
+      }
+      console.log("Sending " + formulas.length + " formulas to the " +
+                  options.server + " server on port " + aPort + " for " +
+                  options.duration + " s...");
+      runLoad(options, formulas, aPort, server.pid, function(aResults) {
+        aResults["server"] = options.server;
+        aResults["method"] = options.method;
+        aResults["rate"] = options.rate;
+        aResults["concurrency"] = options.concurrency;
+        aResults["durationSeconds"] = options.duration;
+        aResults["serverExited"] = exited;
+        /* Close the idle connections before stopping the server.
+           TeXZillaServer.py stops its workers on KeyboardInterrupt. */
+        agent.destroy();
+        setTimeout(function() {
+          server.kill(options.server === "python" ? "SIGINT" : "SIGTERM");
+        }, 100);
+        console.log("Total: " + formatSummary(aResults) +
+                    (aResults["peakServerRSSBytes"] ? ", peak server RSS " +
+                     (aResults["peakServerRSSBytes"] / 1048576).toFixed(1) +
+                     " MiB" : ""));
+        fs.writeFileSync(options.output,
+                         JSON.stringify(aResults, null, 2) + "\n");
+        console.log("Results written to " + options.output);
+      });
+    });
+  });
+}
+
+main(process.argv.slice(2));
@@ -1,3 +1,3 @@
 #!/bin/bash
 SCRIPT_PATH=`dirname "$(readlink -f "$0")"`
-nodejs $SCRIPT_PATH/TeXZilla.js $@
+nodejs $SCRIPT_PATH/codeCache.js $@
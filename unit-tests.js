@@ -7,6 +7,40 @@ var hasDOMAPI = (typeof window !== "undefined" &&
                  typeof DOMParser !== "undefined" &&
                  typeof XMLSerializer !== "undefined" &&
                  typeof Image != "undefined");
+/* The lite parser only knows the characters of $LITE_RANGES, so the tests
+   whose reference output contains other characters are expected to fail. */
+var liteRanges = null;
+if (typeof process !== "undefined" && process.env &&
+    process.env["LITE"] === "yes") {
+  liteRanges = (process.env["LITE_RANGES"] || "").split(/\s+/).
+    filter(function(aRange) { return aRange !== ""; }).
+    map(function(aRange) {
+      var bounds = aRange.split("-");
+      return [parseInt(bounds[0], 16), parseInt(bounds[1] || bounds[0], 16)];
+    });
+}
+
+function isOutsideLiteBuild(aString)
+{
+    var i, codePoint;
+    if (!liteRanges) {
+        return false;
+    }
+    for (i = 0; i < aString.length; i++) {
+        codePoint = aString.charCodeAt(i);
+        if (codePoint >= 0xD800 && codePoint <= 0xDBFF &&
+            i + 1 < aString.length) {
+            codePoint = 0x10000 + ((codePoint - 0xD800) << 10) +
+                (aString.charCodeAt(++i) - 0xDC00);
+        }
+        if (!liteRanges.some(function(aRange) {
+              return aRange[0] <= codePoint && codePoint <= aRange[1];
+            })) {
+            return true;
+        }
+    }
+    return false;
+}
 
 var tests = [
     /* Empty content */
@@ -384,7 +418,8 @@ while (i < tests.length) {
         }
         printTestResult(true);
     } catch(e) {
-        printTestResult(false, tests[i][2]);
+        printTestResult(false, tests[i][2] ||
+                        isOutsideLiteBuild(tests[i][0] + tests[i][1]));
         console.log(e);
     }
 }
@@ -440,6 +475,81 @@ if (!success) {
 }
 TeXZilla.setSafeMode(false);
 
+/* Test writeMathML */
+var chunks = [];
+TeXZilla.writeMathML("\\frac{1}{2}", function (aChunk) {
+  chunks.push(aChunk);
+}, true, true);
+output = chunks.join("");
+success = (output === TeXZilla.toMathMLString("\\frac{1}{2}", true, true) &&
+           output === '<math display="block" dir="rtl" xmlns="http://www.w3.org/1998/Math/MathML"><semantics><mfrac><mn>1</mn><mn>2</mn></mfrac><annotation encoding="TeX">\\frac{1}{2}</annotation></semantics></math>');
+printTestResult(success);
+if (!success) {
+  console.log("Bad writeMathML output: " + escape(output));
+}
+
+/* Test per-call options */
+output = TeXZilla.toMathMLString("xy", false, false, false, {"itexId": true});
+success = (output === '<math xmlns="http://www.w3.org/1998/Math/MathML"><semantics><mi>xy</mi><annotation encoding="TeX">xy</annotation></semantics></math>');
+output =
+  TeXZilla.toMathMLString("\\href{javascript:alert(\"!\")}{\\mtext{evil}}",
+                          false, false, false, {"safe": true});
+success = success && (output === '<math xmlns="http://www.w3.org/1998/Math/MathML"><semantics><mrow><mtext>evil</mtext></mrow><annotation encoding="TeX">\\href{javascript:alert("!")}{\\mtext{evil}}</annotation></semantics></math>');
+output = TeXZilla.filterString("a < $xy$", false,
+                               {"itexId": true, "escapeXML": true});
+success = success && (output === 'a &lt; <math xmlns="http://www.w3.org/1998/Math/MathML"><semantics><mi>xy</mi><annotation encoding="TeX">xy</annotation></semantics></math>');
+/* The options only apply to one call. */
+output = TeXZilla.toMathMLString("xy");
+success = success && (output === '<math xmlns="http://www.w3.org/1998/Math/MathML"><semantics><mrow><mi>x</mi><mi>y</mi></mrow><annotation encoding="TeX">xy</annotation></semantics></math>');
+printTestResult(success);
+if (!success) {
+  console.log("per-call options ignored: " + escape(output));
+}
+
+/* Test profiling */
+TeXZilla.setProfiling(true);
+TeXZilla.toMathMLString("x+y");
+TeXZilla.toMathMLString("\\frac{");
+TeXZilla.filterString("a $b$");
+var statistics = TeXZilla.getStatistics();
+success = (statistics.conversions === 3 && statistics.errors === 1 &&
+           statistics.exceptions === 0 &&
+           statistics.histograms.total.count === 3 &&
+           statistics.histograms.tokens.sum > 0 &&
+           statistics.histograms.outputSize.count === 3 &&
+           statistics.slowest.length === 3);
+TeXZilla.resetStatistics();
+success = success && TeXZilla.getStatistics().conversions === 0;
+TeXZilla.setProfiling(false);
+TeXZilla.toMathMLString("x");
+success = success && TeXZilla.getStatistics() === null;
+printTestResult(success);
+if (!success) {
+  console.log("Bad statistics: " + JSON.stringify(statistics));
+}
+
+/* Test limits */
+TeXZilla.setLimits({"maxLength": 20, "maxDepth": 3, "maxTokens": 10});
+output = TeXZilla.toMathMLString("x+y");
+success = (output === '<math xmlns="http://www.w3.org/1998/Math/MathML"><semantics><mrow><mi>x</mi><mo>+</mo><mi>y</mi></mrow><annotation encoding="TeX">x+y</annotation></semantics></math>');
+output = TeXZilla.toMathMLString("{{{{x}}}}");
+success = success && (output === '<math xmlns="http://www.w3.org/1998/Math/MathML"><semantics><merror><mtext>Input too deeply nested: depth 4 (limit: 3)</mtext></merror><annotation encoding="TeX">{{{{x}}}}</annotation></semantics></math>');
+success = success &&
+  TeXZilla.toMathMLString("x+x+x+x+x+x+x").indexOf("Too many tokens") >= 0 &&
+  TeXZilla.toMathMLString("xxxxxxxxxxxxxxxxxxxxx").indexOf("too long") >= 0;
+try {
+  TeXZilla.toMathMLString("{{{{x}}}}", false, false, true);
+  success = false;
+} catch (e) {
+}
+TeXZilla.setLimits(null);
+success = success && TeXZilla.getLimits() === null &&
+  TeXZilla.toMathMLString("{{{{x}}}}").indexOf("merror") < 0;
+printTestResult(success);
+if (!success) {
+  console.log("Bad limits: " + escape(output));
+}
+
 if (hasDOMAPI) {
   /* Testing toImage */
   /* 1) basic format */
@@ -517,6 +627,59 @@ if (!success) {
   console.log("Bad filterString output: " + output)
 }
 
+/* 3) text without math */
+output = TeXZilla.filterString("blah < blah & \\ blah") + TeXZilla.
+  filterString("blah < blah & \\ blah", false, {"escapeXML": true});
+success = (output === 'blah < blah & \\ blahblah &lt; blah &amp; \\ blah');
+printTestResult(success);
+if (!success) {
+  console.log("Bad filterString output: " + output)
+}
+
+/* Testing createStreamFilter */
+input = "blah $a$ blah $$b$$ blah \\[c\\] \\$ \\\\ blah \\(\\text{$}\\) blah";
+output = TeXZilla.filterString(input);
+success = true;
+for (var chunkSize = 1; chunkSize <= 8; chunkSize++) {
+  var streamFilter = TeXZilla.createStreamFilter(), streamOutput = "";
+  for (var j = 0; j < input.length; j += chunkSize) {
+    streamOutput += streamFilter.write(input.slice(j, j + chunkSize));
+  }
+  streamOutput += streamFilter.end();
+  if (streamOutput !== output) {
+    success = false;
+    console.log("Bad createStreamFilter output: " + streamOutput);
+  }
+}
+printTestResult(success);
+
+/* Testing createStreamFilter with an unclosed delimiter */
+streamFilter = TeXZilla.createStreamFilter(false, {"maxSegmentLength": 8});
+streamOutput = streamFilter.write("blah $a") + streamFilter.write("aaaaaaaa") +
+  streamFilter.write(" $b$ blah") + streamFilter.end();
+success = (streamOutput === "blah $aaaaaaaaa " +
+           TeXZilla.filterString("$b$") + " blah");
+if (!success) {
+  console.log("Bad createStreamFilter output: " + streamOutput);
+}
+printTestResult(success);
+
+/* Testing createIncrementalFilter */
+var incrementalFilter = TeXZilla.createIncrementalFilter();
+input = "blah $a$ blah $$b$$ blah \\(\\text{$}\\) blah";
+output = incrementalFilter.filter(input);
+success = (output === TeXZilla.filterString(input) &&
+           incrementalFilter.converted === 3);
+input = input.replace("$$b$$", "$$c$$");
+output = incrementalFilter.filter(input);
+success = success && (output === TeXZilla.filterString(input) &&
+                      incrementalFilter.reused === 2 &&
+                      incrementalFilter.converted === 1);
+printTestResult(success);
+if (!success) {
+  console.log("Bad createIncrementalFilter output: " + output);
+}
+
 if (hasDOMAPI) {
   /* Testing filterElement */
   // We verify that <head>/attributes/comments are not processed but that
@@ -8,6 +8,7 @@ TEXZILLA="$COMMONJS TeXZilla.js"
 CURL=$2
 KILL=$3
 PKILL=$4
+PYTHON=$5
 EXITCODE=0
 
 testEqual () {
@@ -38,9 +39,19 @@ if [ "$COMMONJS" != "slimerjs" ]; then
     testEqual "Testing streamfilter..." "`echo 'blah $x+y$ blah $$\\frac{1}{2}$$ blah' | $TEXZILLA streamfilter`" 'blah <math xmlns="http://www.w3.org/1998/Math/MathML"><semantics><mrow><mi>x</mi><mo>+</mo><mi>y</mi></mrow><annotation encoding="TeX">x+y</annotation></semantics></math> blah <math xmlns="http://www.w3.org/1998/Math/MathML" display="block"><semantics><mfrac><mn>1</mn><mn>2</mn></mfrac><annotation encoding="TeX">\frac{1}{2}</annotation></semantics></math> blah'
 fi
 
+# Test that the generator finds the characters of unicode.xml, which are in
+# <unicode><charlist>.
+if [ -n "$PYTHON" ]; then
+    testEqual "Testing generateCharCommands.py..." "$($PYTHON generateCharCommands.py unit-tests-unicode.xml | grep -E '^("\\\\(eq|alpha)"|\\u(003D|0028|03B1) )')" '"\\eq" { yytext = "\u003D"; return "OP"; }
+"\\alpha" { yytext = "\u03B1"; return "AILG"; }
+\u03B1 return "AILG";
+\u003D return "OP";
+\u0028 return "OPFS";'
+fi
+
 # Test web server command line API
 PORT=9999
-$TEXZILLA webserver $PORT & PID=$!
+$TEXZILLA webserver $PORT false false true & PID=$!
 
 sleep 1
 
@@ -48,6 +59,12 @@ testEqual "Testing webserver (HTTP)..." "`$CURL -H "Content-Type: application/js
 
 testEqual "Testing webserver (GET)..." "`curl "http://localhost:$PORT/?tex=x+y&rtl=true"`" '"{\"tex\":\"x+y\",\"mathml\":\"<math dir=\\\"rtl\\\" xmlns=\\\"http://www.w3.org/1998/Math/MathML\\\"><semantics><mrow><mi>x</mi><mo>+</mo><mi>y</mi></mrow><annotation encoding=\\\"TeX\\\">x+y</annotation></semantics></math>\",\"exception\":null}"'
 
+testEqual "Testing webserver (batch)..." "`$CURL -H "Content-Type: application/json" -X POST -d '[{"tex":"x+y"},{"tex":"x+y","rtl":"true"},{"tex":"x+y"}]' http://localhost:$PORT`" '"[{\"tex\":\"x+y\",\"mathml\":\"<math xmlns=\\\"http://www.w3.org/1998/Math/MathML\\\"><semantics><mrow><mi>x</mi><mo>+</mo><mi>y</mi></mrow><annotation encoding=\\\"TeX\\\">x+y</annotation></semantics></math>\",\"exception\":null},{\"tex\":\"x+y\",\"mathml\":\"<math dir=\\\"rtl\\\" xmlns=\\\"http://www.w3.org/1998/Math/MathML\\\"><semantics><mrow><mi>x</mi><mo>+</mo><mi>y</mi></mrow><annotation encoding=\\\"TeX\\\">x+y</annotation></semantics></math>\",\"exception\":null},{\"tex\":\"x+y\",\"mathml\":\"<math xmlns=\\\"http://www.w3.org/1998/Math/MathML\\\"><semantics><mrow><mi>x</mi><mo>+</mo><mi>y</mi></mrow><annotation encoding=\\\"TeX\\\">x+y</annotation></semantics></math>\",\"exception\":null}]"'
+
+testEqual "Testing webserver (batch without tex)..." "`$CURL -H "Content-Type: application/json" -X POST -d '[{"display":"true"}]' http://localhost:$PORT`" '"[{\"exception\":\"Missing tex parameter\"}]"'
+
+testEqual "Testing webserver (metrics)..." "`$CURL -s http://localhost:$PORT/metrics | sed 's/.*conversions\\\\":\([0-9]*\).*/\1/'`" '4'
+
 sleep 1
 
 $KILL $PID
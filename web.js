@@ -13,9 +13,18 @@ window["TeXZilla"]["setDOMParser"] = TeXZilla.setDOMParser;
 window["TeXZilla"]["setXMLSerializer"] = TeXZilla.setXMLSerializer;
 window["TeXZilla"]["setSafeMode"] = TeXZilla.setSafeMode;
 window["TeXZilla"]["setItexIdentifierMode"] = TeXZilla.setItexIdentifierMode;
+window["TeXZilla"]["setProfiling"] = TeXZilla.setProfiling;
+window["TeXZilla"]["getStatistics"] = TeXZilla.getStatistics;
+window["TeXZilla"]["resetStatistics"] = TeXZilla.resetStatistics;
+window["TeXZilla"]["setLimits"] = TeXZilla.setLimits;
+window["TeXZilla"]["getLimits"] = TeXZilla.getLimits;
 window["TeXZilla"]["getTeXSource"] = TeXZilla.getTeXSource;
 window["TeXZilla"]["toMathMLString"] = TeXZilla.toMathMLString;
+window["TeXZilla"]["writeMathML"] = TeXZilla.writeMathML;
 window["TeXZilla"]["toMathML"] = TeXZilla.toMathML;
 window["TeXZilla"]["toImage"] = TeXZilla.toImage;
 window["TeXZilla"]["filterString"] = TeXZilla.filterString;
 window["TeXZilla"]["filterElement"] = TeXZilla.filterElement;
+window["TeXZilla"]["createStreamFilter"] = TeXZilla.createStreamFilter;
+window["TeXZilla"]["createIncrementalFilter"] =
+  TeXZilla.createIncrementalFilter;